@@ -0,0 +1,237 @@
+"""
+Benchmarks for the Bloom filter variants. Run with: python bench.py [layouts|alternatives|hashes|threads|readonly] [sizes...]
+e.g. python bench.py layouts 1000000 10000000
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Tuple, Type
+
+import numpy as np
+
+import counting  # noqa: F401  (registers kind 2, the counting filter, for check_read_only)
+from blocked import BlockedBloomFilter
+from cuckoo import CuckooFilter
+from main import Blake2Hash, Bloom, BloomFilter, Hash, Key, MurmurHash, XXHash, xxhash
+from threadsafe import ConcurrentBloomFilter, StripedBloomFilter
+from xor import XorFilter
+
+FP_RATE = 0.01
+BATCH = 1_000_000
+THREADS = 16
+TRIALS = 5
+
+
+def batches(count: int, prefix: str = "") -> Iterator[List[str]]:
+    for start in range(0, count, BATCH):
+        yield [f"{prefix}{i}" for i in range(start, min(start + BATCH, count))]
+
+
+def bench_layouts(sizes: List[int]) -> None:
+    """Lookup throughput and false-positive rate of the classic and blocked layouts."""
+    print(f"target fp rate {FP_RATE:.2%}; lookups/s include hashing, probes/s exclude it")
+    print(f"{'keys':>12}  {'layout':<8}{'MiB':>8}{'lookups/s':>12}{'probes/s':>12}{'fp rate':>9}")
+
+    layouts: List[Callable[[int, float], Bloom]] = [BloomFilter, BlockedBloomFilter]
+    for count in sizes:
+        for layout in layouts:
+            bf = layout(count, FP_RATE)
+            for batch in batches(count):
+                bf.add_many(batch)
+
+            lookup_time, probe_time, false_positives = 0.0, 0.0, 0
+            for batch in batches(count, prefix="absent-"):
+                start = time.perf_counter()
+                indexes = bf._indexes_many(batch)
+                probe_start = time.perf_counter()
+                found = bf._test(indexes)
+                end = time.perf_counter()
+                lookup_time += end - start
+                probe_time += end - probe_start
+                false_positives += int(np.count_nonzero(found))
+
+            print(f"{count:>12}  {layout.__name__.replace('BloomFilter', '') or 'Classic':<8}"
+                  f"{bf.m / 8 / 2 ** 20:>8.1f}{count / lookup_time:>12.0f}{count / probe_time:>12.0f}"
+                  f"{false_positives / count:>9.3%}")
+
+
+def bench_alternatives(sizes: List[int]) -> None:
+    """Space, build time and lookup throughput of Bloom filters against cuckoo and xor filters."""
+    builders: List[Tuple[str, Callable[[int], Bloom]]] = [
+        ("bloom 1%", lambda count: BloomFilter(count, FP_RATE)),
+        ("blocked 1%", lambda count: BlockedBloomFilter(count, FP_RATE)),
+        ("cuckoo 8", lambda count: CuckooFilter(count, fingerprint_bits=8)),
+        ("cuckoo 16", lambda count: CuckooFilter(count, fingerprint_bits=16)),
+    ]
+    print(f"{'keys':>12}  {'filter':<11}{'bits/key':>9}{'build s':>9}{'lookups/s':>12}{'fp rate':>9}")
+
+    for count in sizes:
+        results = []
+        for name, build in builders:
+            start = time.perf_counter()
+            f = build(count)
+            for batch in batches(count):
+                f.add_many(batch)
+            results.append((name, f, time.perf_counter() - start))
+        for bits in (8, 16):
+            start = time.perf_counter()
+            f = XorFilter((key for batch in batches(count) for key in batch), fingerprint_bits=bits)
+            results.append((f"xor {bits}", f, time.perf_counter() - start))
+
+        for name, f, build_time in results:
+            lookup_time, false_positives = 0.0, 0
+            for batch in batches(count, prefix="absent-"):
+                start = time.perf_counter()
+                false_positives += int(np.count_nonzero(f.contains_many(batch)))
+                lookup_time += time.perf_counter() - start
+            size = f.m if isinstance(f, BloomFilter) else f._table.nbytes * 8
+            print(f"{count:>12}  {name:<11}{size / count:>9.2f}{build_time:>9.2f}{count / lookup_time:>12.0f}"
+                  f"{false_positives / count:>9.3%}")
+
+
+def bench_hashes(sizes: List[int]) -> None:
+    """Hashes/s per backend, one key at a time (halves) and batched (hash_many), for str and bytes keys."""
+    backends: List[Type[Hash]] = [MurmurHash, Blake2Hash] + ([XXHash] if xxhash is not None else [])
+    print(f"{'keys':>12}  {'backend':<12}{'key':<7}{'halves/s':>12}{'hash_many/s':>13}")
+
+    for count in sizes:
+        for backend in backends:
+            h = backend()
+            for kind in (str, bytes):
+                single_time, many_time = 0.0, 0.0
+                for batch in batches(count, prefix="key-"):
+                    if kind is bytes:
+                        batch = [s.encode() for s in batch]
+                    start = time.perf_counter()
+                    for s in batch:
+                        h.halves(s)
+                    middle = time.perf_counter()
+                    h.hash_many(batch)
+                    single_time += middle - start
+                    many_time += time.perf_counter() - middle
+                print(f"{count:>12}  {backend.__name__:<12}{kind.__name__:<7}"
+                      f"{count / single_time:>12.0f}{count / many_time:>13.0f}")
+
+
+class _YieldingBloomFilter(BloomFilter):
+    """
+    Control: BloomFilter whose add gives up the GIL between reading a byte and writing
+    it back, widening the race window the GIL otherwise almost never opens.
+    """
+
+    def add(self, s: Key) -> None:
+        for i in self._indexes(s):
+            byte = self._bits[i >> 3]
+            time.sleep(0)
+            self._bits[i >> 3] = byte | 1 << (i & 7)
+
+
+def bench_threads(sizes: List[int]) -> None:
+    """
+    Stress check: THREADS threads add disjoint keys to one shared filter, half one at a
+    time and half in small batches, then every key must be found. The thread switch
+    interval is cut to a microsecond so threads interleave mid-update as often as
+    possible. Each filter is run TRIALS times per size. The unsynchronized controls,
+    plain BloomFilter and one that yields mid-update, can lose bits, and how often
+    they do shows whether the run raced at all. Exits non-zero if
+    ConcurrentBloomFilter or StripedBloomFilter misses a key.
+    """
+    controls = [BloomFilter, _YieldingBloomFilter]
+    layouts: List[Callable[[int, float], Bloom]] = controls + [ConcurrentBloomFilter, StripedBloomFilter]
+    print(f"{THREADS} threads, {TRIALS} trials")
+    print(f"{'keys':>12}  {'filter':<24}{'adds/s':>10}{'lossy trials':>14}{'false negatives':>17}")
+
+    failures = []
+    control_losses = 0
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for count in sizes:
+            keys = [f"key-{i}" for i in range(count)]
+            for layout in layouts:
+                elapsed, lossy, missing = 0.0, 0, 0
+                for _ in range(TRIALS):
+                    bf = layout(count, FP_RATE)
+
+                    def writer(thread: int) -> None:
+                        own = keys[thread::THREADS]
+                        half = len(own) // 2
+                        for s in own[:half]:
+                            bf.add(s)
+                        for start in range(half, len(own), 64):
+                            bf.add_many(own[start:start + 64])
+
+                    start = time.perf_counter()
+                    with ThreadPoolExecutor(THREADS) as pool:
+                        list(pool.map(writer, range(THREADS)))
+                    elapsed += time.perf_counter() - start
+
+                    lost = count - int(np.count_nonzero(bf.contains_many(keys)))
+                    lossy += lost > 0
+                    missing += lost
+
+                trials = f"{lossy}/{TRIALS}"
+                print(f"{count:>12}  {layout.__name__:<24}{TRIALS * count / elapsed:>10.0f}{trials:>14}{missing:>17}")
+                if layout in controls:
+                    control_losses += lossy
+                elif missing:
+                    failures.append(f"{layout.__name__} lost {missing} keys at {count} keys")
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    if failures:
+        sys.exit("FAILED: " + "; ".join(failures))
+    if control_losses:
+        print(f"OK: the controls lost bits in {control_losses} of {len(controls) * TRIALS * len(sizes)} trials, "
+              "the thread-safe filters in none")
+    else:
+        print("OK, but inconclusive: no control lost a bit, so these runs didn't race; try more keys")
+
+
+def check_read_only(sizes: List[int]) -> None:
+    """
+    Regression check: every registered kind opened with Bloom.open(path, mmap=True)
+    must raise TypeError on add, add_many and remove instead of writing to the
+    read-only mapping, which crashes the interpreter. Exits non-zero on failure.
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, layout in sorted(BloomFilter._kinds.items()):
+            path = os.path.join(tmp, f"{kind}.bloom")
+            bf = layout(sizes[0], FP_RATE)
+            bf.add_many(["present"])
+            bf.save(path)
+
+            mapped = Bloom.open(path)
+            writes = [("add", lambda: mapped.add("x")), ("add_many", lambda: mapped.add_many(["x"]))]
+            if hasattr(mapped, "remove"):
+                writes.append(("remove", lambda: mapped.remove("present")))
+            for name, write in writes:
+                try:
+                    write()
+                    failures.append(f"{layout.__name__}.{name} wrote to a read-only mapping")
+                except TypeError:
+                    pass
+            if not mapped.contains("present") or mapped.contains_many(["x"])[0] != bf.contains("x"):
+                failures.append(f"{layout.__name__} changed after rejected writes")
+            print(f"{layout.__name__:<24}{', '.join(name for name, _ in writes)} rejected")
+
+    if failures:
+        sys.exit("FAILED: " + "; ".join(failures))
+    print("OK")
+
+
+if __name__ == '__main__':
+    benches = {
+        "layouts": bench_layouts,
+        "alternatives": bench_alternatives,
+        "hashes": bench_hashes,
+        "threads": bench_threads,
+        "readonly": check_read_only,
+    }
+    args = sys.argv[1:]
+    bench = benches[args.pop(0)] if args and args[0] in benches else bench_layouts
+    bench([int(arg) for arg in args] or [1_000_000, 10_000_000, 100_000_000])
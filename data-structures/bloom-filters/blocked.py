@@ -0,0 +1,51 @@
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from main import BloomFilter, Hash, Key
+
+_BLOCK_BITS = 512  # one 64-byte cache line
+
+
+class BlockedBloomFilter(BloomFilter):
+    """
+    Bloom filter whose k bits for a key all fall in one 64-byte block (Putze et al.).
+
+    The low hash half picks the block and the high half is split into two 32-bit
+    values that double-hash within it. A lookup therefore touches one cache line
+    instead of k, at the cost of a slightly higher false-positive rate for the same
+    m. The bit array is aligned to 64 bytes so blocks never straddle cache lines.
+    """
+
+    _KIND = 1
+
+    def __init__(self, expected_items: int, fp_rate: float, hash_fn: Hash = None):
+        super().__init__(expected_items, fp_rate, hash_fn)
+        self._blocks = -(-self.m // _BLOCK_BITS)
+        self.m = self._blocks * _BLOCK_BITS
+
+        nbytes = self.m // 8
+        raw = np.zeros(nbytes + 64, dtype=np.uint8)
+        offset = -raw.ctypes.data % 64
+        self._bits = memoryview(raw[offset:offset + nbytes])
+
+    @classmethod
+    def _restore(cls, m: int, k: int, hash_fn: Hash, bits: memoryview) -> "BlockedBloomFilter":
+        bf = super()._restore(m, k, hash_fn, bits)
+        bf._blocks = m // _BLOCK_BITS
+        return bf
+
+    def _indexes(self, s: Key) -> Iterator[int]:
+        h1, h2 = self._hash_fn.halves(s)
+        base = (h1 % self._blocks) * _BLOCK_BITS
+        # an odd step visits k distinct positions of the power-of-two block
+        a, b = h2 & 0xFFFFFFFF, (h2 >> 32) | 1
+        for i in range(self.k):
+            yield base + (a + i * b) % _BLOCK_BITS
+
+    def _indexes_many(self, keys: Iterable[Key]) -> np.ndarray:
+        digests = self._hash_fn.hash_many(list(keys))
+        h1, h2 = digests[:, :1], digests[:, 1:]
+        base = (h1 % np.uint64(self._blocks)) * np.uint64(_BLOCK_BITS)
+        a, b = h2 & np.uint64(0xFFFFFFFF), (h2 >> np.uint64(32)) | np.uint64(1)
+        return base + (a + np.arange(self.k, dtype=np.uint64) * b) % np.uint64(_BLOCK_BITS)
@@ -0,0 +1,82 @@
+from typing import Callable
+
+import numpy as np
+
+from main import BloomFilter, Hash, Key
+
+_MAX_COUNT = 15
+
+
+class CountingBloomFilter(BloomFilter):
+    """
+    Bloom filter with 4-bit counters instead of bits, so keys can be removed.
+
+    Two counters are packed per byte (counter i lives in the low nibble of byte
+    i // 2 when i is even, the high nibble when odd), using 4x the memory of a plain
+    filter with the same m. Counters saturate at 15 and are never decremented once
+    saturated: their true count is unknown, and decrementing could cause false
+    negatives.
+    """
+
+    _KIND = 2
+
+    def __init__(self, expected_items: int, fp_rate: float, hash_fn: Hash = None):
+        super().__init__(expected_items, fp_rate, hash_fn)
+        self._bits = bytearray((self.m + 1) // 2)
+
+    def add(self, s: Key) -> None:
+        self._check_writable()
+        for i in self._indexes(s):
+            shift = (i & 1) << 2
+            if (self._bits[i >> 1] >> shift) & 0xF < _MAX_COUNT:
+                self._bits[i >> 1] += 1 << shift
+
+    def contains(self, s: Key) -> bool:
+        return all((self._bits[i >> 1] >> ((i & 1) << 2)) & 0xF for i in self._indexes(s))
+
+    def remove(self, s: Key) -> bool:
+        """Removes s if it may be present; returns False when it was definitely absent."""
+        self._check_writable()
+        if not self.contains(s):
+            return False
+        for i in self._indexes(s):
+            shift = (i & 1) << 2
+            if (self._bits[i >> 1] >> shift) & 0xF < _MAX_COUNT:
+                self._bits[i >> 1] -= 1 << shift
+        return True
+
+    def union(self, other: "CountingBloomFilter") -> "CountingBloomFilter":
+        """Counters summed (saturating), i.e. the filter of both key multisets."""
+        return self._combine(other, lambda a, b: np.minimum(a + b, _MAX_COUNT))
+
+    def intersection(self, other: "CountingBloomFilter") -> "CountingBloomFilter":
+        return self._combine(other, np.minimum)
+
+    def _combine(self, other: BloomFilter, op: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> "CountingBloomFilter":
+        def per_counter(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+            low = op(a & 0xF, b & 0xF).astype(np.uint8)
+            high = op(a >> 4, b >> 4).astype(np.uint8)
+            return low | (high << 4)
+
+        return super()._combine(other, per_counter)
+
+    def _popcount(self) -> int:
+        # counters in use rather than bits set
+        view = self._view
+        return int(np.count_nonzero(view & 0xF) + np.count_nonzero(view >> 4))
+
+    def _set(self, indexes: np.ndarray) -> None:
+        counters, increments = np.unique(indexes, return_counts=True)
+        view = self._view
+        # counters sharing a byte are updated in two passes, one per nibble
+        for nibble in (0, 1):
+            selected = (counters & 1) == nibble
+            byte = counters[selected] >> 1
+            shift = np.uint8(nibble << 2)
+            current = (view[byte] >> shift) & 0xF
+            updated = np.minimum(current + increments[selected], _MAX_COUNT).astype(np.uint8)
+            view[byte] = (view[byte] & ~np.uint8(0xF << shift)) | (updated << shift)
+
+    def _test(self, indexes: np.ndarray) -> np.ndarray:
+        shifts = ((indexes & 1) << 2).astype(np.uint8)
+        return ((self._view[indexes >> 1] >> shifts) & 0xF).all(axis=1)
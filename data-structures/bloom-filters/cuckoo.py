@@ -0,0 +1,131 @@
+import math
+import random
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from main import Bloom, Hash, Key, MurmurHash
+
+_MAX_KICKS = 500
+_LOAD_FACTOR = 0.95
+_MASK64 = (1 << 64) - 1
+
+
+class CuckooFilter(Bloom):
+    """
+    Cuckoo filter (Fan et al., 2014): a table of buckets holding short fingerprints.
+
+    A key's fingerprint may live in bucket i1 or i2 = (H(fingerprint) - i1) mod n, so
+    either bucket can be derived from the other and fingerprints can be moved
+    without the original key. That makes deletion possible, unlike a Bloom filter.
+    (The paper's i1 ^ H(fingerprint) needs a power-of-two n, which can leave the
+    table half empty; the subtraction form works for any n.)
+    The false-positive rate is about 2 * bucket_size / 2^fingerprint_bits.
+    """
+
+    def __init__(self, expected_items: int, fingerprint_bits: int = 16, bucket_size: int = 4, hash_fn: Hash = None):
+        if fingerprint_bits not in (8, 16):
+            raise ValueError("fingerprint_bits must be 8 or 16")
+
+        buckets = max(1, math.ceil(expected_items / (bucket_size * _LOAD_FACTOR)))
+        self._buckets = buckets
+        self._fingerprint_mask = (1 << fingerprint_bits) - 1
+        # 0 marks an empty slot, so fingerprints are drawn from 1..2^bits - 1
+        self._table = np.zeros((buckets, bucket_size), dtype=np.uint8 if fingerprint_bits == 8 else np.uint16)
+        self._hash_fn = hash_fn if hash_fn is not None else MurmurHash()
+        self._victim: Optional[Tuple[int, int]] = None
+        self._random = random.Random(0)
+
+    def add(self, s: Key) -> None:
+        if self._victim is not None:
+            raise RuntimeError("cuckoo filter is full")
+
+        i1, fp = self._locate(s)
+        i2 = self._other(i1, fp)
+        if self._insert(i1, fp) or self._insert(i2, fp):
+            return
+
+        # evict a random fingerprint and move it to its alternate bucket, repeatedly
+        i = self._random.choice((i1, i2))
+        for _ in range(_MAX_KICKS):
+            slot = self._random.randrange(self._table.shape[1])
+            fp, self._table[i, slot] = int(self._table[i, slot]), fp
+            i = self._other(i, fp)
+            if self._insert(i, fp):
+                return
+        # the last evicted fingerprint is stashed so no key is ever lost
+        self._victim = (i, fp)
+
+    def contains(self, s: Key) -> bool:
+        i1, fp = self._locate(s)
+        i2 = self._other(i1, fp)
+        if self._victim is not None and self._victim[1] == fp and self._victim[0] in (i1, i2):
+            return True
+        return bool((self._table[i1] == fp).any() or (self._table[i2] == fp).any())
+
+    def remove(self, s: Key) -> bool:
+        """Removes one copy of s; only remove keys that were added, or other keys may be lost."""
+        i1, fp = self._locate(s)
+        i2 = self._other(i1, fp)
+        if self._victim is not None and self._victim[1] == fp and self._victim[0] in (i1, i2):
+            self._victim = None
+            return True
+
+        for i in (i1, i2):
+            slots = np.flatnonzero(self._table[i] == fp)
+            if len(slots):
+                self._table[i, slots[0]] = 0
+                if self._victim is not None:
+                    # a slot just opened up for the stashed fingerprint
+                    victim_bucket, victim_fp = self._victim
+                    self._victim = None
+                    if not (self._insert(victim_bucket, victim_fp) or
+                            self._insert(self._other(victim_bucket, victim_fp), victim_fp)):
+                        self._victim = (victim_bucket, victim_fp)
+                return True
+        return False
+
+    def contains_many(self, keys: Iterable[Key]) -> np.ndarray:
+        digests = self._hash_fn.hash_many(list(keys))
+        buckets = np.uint64(self._buckets)
+        i1 = digests[:, 0] % buckets
+        fp = digests[:, 1] & np.uint64(self._fingerprint_mask)
+        fp[fp == 0] = 1
+        i2 = (_mix_many(fp) % buckets + buckets - i1) % buckets
+
+        fp = fp.astype(self._table.dtype)[:, None]
+        found = (self._table[i1] == fp).any(axis=1) | (self._table[i2] == fp).any(axis=1)
+        if self._victim is not None:
+            bucket, victim_fp = self._victim
+            found |= (fp[:, 0] == victim_fp) & ((i1 == bucket) | (i2 == bucket))
+        return found
+
+    def _locate(self, s: Key) -> Tuple[int, int]:
+        low, high = self._hash_fn.halves(s)
+        return low % self._buckets, (high & self._fingerprint_mask) or 1
+
+    def _other(self, i: int, fp: int) -> int:
+        return (_mix(fp) - i) % self._buckets
+
+    def _insert(self, i: int, fp: int) -> bool:
+        empty = np.flatnonzero(self._table[i] == 0)
+        if len(empty) == 0:
+            return False
+        self._table[i, empty[0]] = fp
+        return True
+
+
+def _mix(fp: int) -> int:
+    """H(fingerprint): splitmix64, computed on the fly so no per-filter table is needed."""
+    x = (fp + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _mix_many(fp: np.ndarray) -> np.ndarray:
+    """_mix over an array of fingerprints; uint64 array arithmetic wraps like the masks above."""
+    x = fp.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
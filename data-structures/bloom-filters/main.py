@@ -1,48 +1,310 @@
+import hashlib
+import math
+import mmap as _mmap
+import os
+import struct
 from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Type, Union
 
 import mmh3
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+_MASK64 = (1 << 64) - 1
+
+# serialized layout: header (magic, version, kind, k, hash seed, m, payload bytes,
+# hash backend), zero padding up to 64 bytes so a memory-mapped payload starts on a
+# cache line, then the raw bit (or counter) array. Version 1 had no backend byte; its
+# zero padding reads as backend 0, MurmurHash, which was the only one then.
+_MAGIC = b"BLOM"
+_VERSION = 2
+_HEADER = struct.Struct("<4sBBHIQQB")
+_HEADER_SIZE = 64
+
+# set bits in every byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# keys are hashed as given: bytes as-is, str as its UTF-8 encoding
+Key = Union[str, bytes]
+
+
+def _encode(s: Key) -> bytes:
+    return s.encode() if isinstance(s, str) else s
 
 
 class Bloom(ABC):
     @abstractmethod
-    def add(self, s: str) -> None:
+    def add(self, s: Key) -> None:
         raise NotImplementedError
 
     @abstractmethod
-    def contains(self, s: str) -> bool:
+    def contains(self, s: Key) -> bool:
         raise NotImplementedError
 
+    def add_many(self, keys: Iterable[Key]) -> None:
+        for s in keys:
+            self.add(s)
+
+    def contains_many(self, keys: Iterable[Key]) -> np.ndarray:
+        return np.fromiter((self.contains(s) for s in keys), dtype=bool)
+
+    @staticmethod
+    def open(path: str, mmap: bool = True) -> "BloomFilter":
+        """
+        Loads a filter written by save(). With mmap the file is mapped read-only and
+        queried in place, so processes opening the same file share one physical copy
+        and nothing is deserialized; adding to such a filter raises TypeError.
+        """
+        with open(path, "rb") as f:
+            if mmap:
+                buffer = memoryview(_mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ))
+            else:
+                buffer = memoryview(bytearray(f.read()))
+        return BloomFilter.from_buffer(buffer)
+
 
 class Hash(ABC):
+    """
+    128-bit hash of str or bytes keys. Built-in backends set _ID, the tag written to
+    the serialization header, and are rebuilt from their seed when a filter is loaded.
+    """
+
+    _ID: Optional[int] = None
+    _ids: Dict[int, Type["Hash"]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get("_ID") is not None:
+            Hash._ids[cls._ID] = cls
+
     @abstractmethod
-    def hash(self, s: str) -> int:
+    def hash(self, s: Key) -> int:
         raise NotImplementedError
 
+    def halves(self, s: Key) -> Tuple[int, int]:
+        """The 128-bit hash as (low, high) 64-bit halves."""
+        digest = self.hash(s)
+        return digest & _MASK64, digest >> 64
+
+    def hash_many(self, keys: Sequence[Key]) -> np.ndarray:
+        """128-bit hashes of keys as an (n, 2) uint64 array of [low, high] halves."""
+        digests = b"".join(self.hash(s).to_bytes(16, "little") for s in keys)
+        return np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+
 
 class MurmurHash(Hash):
-    def hash(self, s: str) -> int:
-        return mmh3.hash128(s, 0)
+    _ID = 0
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def hash(self, s: Key) -> int:
+        return mmh3.hash128(s, self.seed)
+
+    def halves(self, s: Key) -> Tuple[int, int]:
+        # the same 128-bit digest, without building a 128-bit int
+        return mmh3.hash64(s, self.seed, signed=False)
+
+    def hash_many(self, keys: Sequence[Key]) -> np.ndarray:
+        # hash_bytes is the same 128-bit digest, already little-endian
+        digests = b"".join([mmh3.hash_bytes(s, self.seed) for s in keys])
+        return np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+
+
+class XXHash(Hash):
+    """XXH3 128-bit; needs the optional xxhash package."""
+
+    _ID = 1
+
+    def __init__(self, seed: int = 0):
+        if xxhash is None:
+            raise ImportError("XXHash needs the xxhash package: pip install xxhash")
+        self.seed = seed
+
+    def hash(self, s: Key) -> int:
+        return xxhash.xxh3_128_intdigest(_encode(s), self.seed)
+
+    def hash_many(self, keys: Sequence[Key]) -> np.ndarray:
+        # digests are big-endian, so each one reads as [high, low]
+        digests = b"".join([xxhash.xxh3_128_digest(_encode(s), self.seed) for s in keys])
+        return np.frombuffer(digests, dtype=">u8").reshape(-1, 2)[:, ::-1].astype("<u8")
+
+
+class Blake2Hash(Hash):
+    """BLAKE2b cut to 128 bits, from the standard library; slower, but always available."""
+
+    _ID = 2
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self._salt = seed.to_bytes(16, "little")
+
+    def hash(self, s: Key) -> int:
+        return int.from_bytes(self._digest(s), "little")
+
+    def hash_many(self, keys: Sequence[Key]) -> np.ndarray:
+        digests = b"".join([self._digest(s) for s in keys])
+        return np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+
+    def _digest(self, s: Key) -> bytes:
+        return hashlib.blake2b(_encode(s), digest_size=16, salt=self._salt).digest()
+
+
+def optimal_parameters(expected_items: int, fp_rate: float) -> Tuple[int, int]:
+    """Bit count m and hash count k minimizing memory for n items at false-positive rate p."""
+    if expected_items <= 0:
+        raise ValueError("expected_items must be positive")
+    if not 0 < fp_rate < 1:
+        raise ValueError("fp_rate must be between 0 and 1")
+
+    m = math.ceil(-expected_items * math.log(fp_rate) / math.log(2) ** 2)
+    k = max(1, round(m / expected_items * math.log(2)))
+    return m, k
+
+
+class BloomFilter(Bloom):
+    """
+    Bloom filter sized from the expected number of items and a target false-positive
+    rate. Bits are packed eight to a byte, and the k bit indexes of a key come from a
+    single 128-bit hash split into two 64-bit halves (Kirsch-Mitzenmacher):
+    g_i = h1 + i * h2 mod m.
+    """
+
+    # format tag written to the header; subclasses pick their own
+    _KIND = 0
+    _kinds: Dict[int, Type["BloomFilter"]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "_KIND" in cls.__dict__:
+            BloomFilter._kinds[cls._KIND] = cls
+
+    def __init__(self, expected_items: int, fp_rate: float, hash_fn: Hash = None):
+        self.m, self.k = optimal_parameters(expected_items, fp_rate)
+        self._bits = bytearray((self.m + 7) // 8)
+        self._hash_fn = hash_fn if hash_fn is not None else MurmurHash()
+
+    def to_bytes(self) -> bytes:
+        backend = type(self._hash_fn)._ID
+        if backend is None:
+            raise ValueError("only filters using a built-in hash backend can be serialized")
+        header = _HEADER.pack(
+            _MAGIC, _VERSION, self._KIND, self.k, self._hash_fn.seed, self.m, len(self._bits), backend,
+        )
+        return header.ljust(_HEADER_SIZE, b"\0") + bytes(self._bits)
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "BloomFilter":
+        return BloomFilter.from_buffer(memoryview(bytearray(data)))
+
+    @staticmethod
+    def from_buffer(buffer: memoryview) -> "BloomFilter":
+        """Rebuilds a filter whose bits stay in buffer, which is used without copying."""
+        magic, version, kind, k, seed, m, size, backend = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError("not a serialized Bloom filter")
+        if version not in (1, _VERSION):
+            raise ValueError(f"unsupported Bloom filter format version {version}")
+        if kind not in BloomFilter._kinds:
+            raise ValueError(f"unknown Bloom filter kind {kind}; import the module that defines it")
+        if backend not in Hash._ids:
+            raise ValueError(f"unknown hash backend {backend}")
+        hash_fn = Hash._ids[backend](seed)
+        return BloomFilter._kinds[kind]._restore(m, k, hash_fn, buffer[_HEADER_SIZE:_HEADER_SIZE + size])
+
+    @classmethod
+    def _restore(cls, m: int, k: int, hash_fn: Hash, bits: memoryview) -> "BloomFilter":
+        bf = cls.__new__(cls)
+        bf.m, bf.k, bf._hash_fn, bf._bits = m, k, hash_fn, bits
+        return bf
+
+    def add(self, s: Key) -> None:
+        self._check_writable()
+        for i in self._indexes(s):
+            self._bits[i >> 3] |= 1 << (i & 7)
+
+    def contains(self, s: Key) -> bool:
+        return all(self._bits[i >> 3] & (1 << (i & 7)) for i in self._indexes(s))
+
+    def add_many(self, keys: Iterable[Key]) -> None:
+        self._check_writable()
+        self._set(self._indexes_many(keys))
+
+    def contains_many(self, keys: Iterable[Key]) -> np.ndarray:
+        return self._test(self._indexes_many(keys))
+
+    def union(self, other: "BloomFilter") -> "BloomFilter":
+        """Filter holding the keys of both filters, as if every key had been added to one."""
+        return self._combine(other, np.bitwise_or)
+
+    def intersection(self, other: "BloomFilter") -> "BloomFilter":
+        """
+        Filter answering True for keys in both filters. It can report more false
+        positives than a filter built from the true intersection.
+        """
+        return self._combine(other, np.bitwise_and)
+
+    def approximate_count(self) -> float:
+        """Estimated number of distinct keys added, from the number X of set bits: -(m / k) ln(1 - X / m)."""
+        filled = self._popcount()
+        if filled >= self.m:
+            return math.inf
+        return -self.m / self.k * math.log(1 - filled / self.m)
+
+    def _combine(self, other: "BloomFilter", op: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> "BloomFilter":
+        if type(other) is not type(self) or (other.m, other.k) != (self.m, self.k):
+            raise ValueError("filters must be of the same kind with the same m and k")
+        if type(other._hash_fn) is not type(self._hash_fn) or vars(other._hash_fn) != vars(self._hash_fn):
+            raise ValueError("filters must use the same hash function and seed")
+        return self._restore(self.m, self.k, self._hash_fn, memoryview(op(self._view, other._view)))
+
+    def _check_writable(self) -> None:
+        # numpy's ufunc.at doesn't check, and writing to a read-only mapping crashes the process
+        if memoryview(self._bits).readonly:
+            raise TypeError("filter is memory-mapped read-only; open it with mmap=False to add keys")
+
+    def _popcount(self) -> int:
+        return int(_POPCOUNT[self._view].sum(dtype=np.int64))
+
+    def _set(self, indexes: np.ndarray) -> None:
+        # ufunc.at applies every OR even when several indexes land in the same byte
+        np.bitwise_or.at(self._view, indexes >> 3, (1 << (indexes & 7)).astype(np.uint8))
+
+    def _test(self, indexes: np.ndarray) -> np.ndarray:
+        return ((self._view[indexes >> 3] >> (indexes & 7).astype(np.uint8)) & 1).all(axis=1)
+
+    @property
+    def _view(self) -> np.ndarray:
+        return np.frombuffer(self._bits, dtype=np.uint8)
 
+    def _indexes(self, s: Key) -> Iterator[int]:
+        h1, h2 = self._hash_fn.halves(s)
+        for i in range(self.k):
+            yield ((h1 + i * h2) & _MASK64) % self.m
 
-class TerribleBloomFilter(Bloom):
-    def __init__(self, hash_fn: Hash):
-        self._LENGTH = 100
-        self._array = [0] * self._LENGTH
-        self._hash_fn = hash_fn
+    def _indexes_many(self, keys: Iterable[Key]) -> np.ndarray:
+        """(n, k) bit indexes; uint64 arithmetic wraps exactly like the & _MASK64 in _indexes."""
+        digests = self._hash_fn.hash_many(list(keys))
+        h1, h2 = digests[:, :1], digests[:, 1:]
+        return (h1 + np.arange(self.k, dtype=np.uint64) * h2) % np.uint64(self.m)
 
-    def add(self, s: str) -> None:
-        digest = self._hash_fn.hash(s)
-        val = digest % self._LENGTH
-        self._array[val] = 1
 
-    def contains(self, s: str) -> bool:
-        digest = self._hash_fn.hash(s)
-        val = digest % self._LENGTH
-        return self._array[val] == 1
+BloomFilter._kinds[BloomFilter._KIND] = BloomFilter
 
 
 if __name__ == '__main__':
-    bf = TerribleBloomFilter(MurmurHash())
+    bf = BloomFilter(expected_items=1000, fp_rate=0.01)
     for word in [
         "Girish",
         "Bloom",
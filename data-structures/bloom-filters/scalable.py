@@ -0,0 +1,72 @@
+from typing import Iterable, List
+
+import numpy as np
+
+from main import Bloom, BloomFilter, Hash, Key, MurmurHash
+
+
+class ScalableBloomFilter(Bloom):
+    """
+    Bloom filter that grows without a preset capacity (Almeida et al., 2007).
+
+    Sub-filters are chained: when the newest one reaches its capacity a new one is
+    started with growth times the capacity and a false-positive rate tightened by
+    ratio. With rates p * (1 - ratio) * ratio^i the compound false-positive rate
+    stays below p however many sub-filters are added.
+    """
+
+    def __init__(
+            self,
+            initial_capacity: int = 1000,
+            fp_rate: float = 0.01,
+            growth: int = 2,
+            ratio: float = 0.85,
+            hash_fn: Hash = None,
+    ):
+        self._initial_capacity = initial_capacity
+        self._fp_rate = fp_rate
+        self._growth = growth
+        self._ratio = ratio
+        self._hash_fn = hash_fn if hash_fn is not None else MurmurHash()
+        self._filters: List[BloomFilter] = []
+        self._capacities: List[int] = []
+        self._fill = 0
+        self._grow()
+
+    def add(self, s: Key) -> None:
+        if self.contains(s):
+            return
+        if self._fill >= self._capacities[-1]:
+            self._grow()
+        self._filters[-1].add(s)
+        self._fill += 1
+
+    def contains(self, s: Key) -> bool:
+        # the newest filter holds the most keys, so check it first
+        return any(f.contains(s) for f in reversed(self._filters))
+
+    def add_many(self, keys: Iterable[Key]) -> None:
+        keys = list(keys)
+        new = [s for s, present in zip(keys, self.contains_many(keys)) if not present]
+        while new:
+            if self._fill >= self._capacities[-1]:
+                self._grow()
+            room = self._capacities[-1] - self._fill
+            self._filters[-1].add_many(new[:room])
+            self._fill += min(room, len(new))
+            new = new[room:]
+
+    def contains_many(self, keys: Iterable[Key]) -> np.ndarray:
+        keys = list(keys)
+        found = np.zeros(len(keys), dtype=bool)
+        for f in self._filters:
+            found |= f.contains_many(keys)
+        return found
+
+    def _grow(self) -> None:
+        i = len(self._filters)
+        capacity = self._initial_capacity * self._growth ** i
+        fp_rate = self._fp_rate * (1 - self._ratio) * self._ratio ** i
+        self._filters.append(BloomFilter(capacity, fp_rate, self._hash_fn))
+        self._capacities.append(capacity)
+        self._fill = 0
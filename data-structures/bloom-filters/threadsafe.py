@@ -0,0 +1,91 @@
+import threading
+from typing import List
+
+import numpy as np
+
+from main import BloomFilter, Hash, Key
+
+_STRIPES = 64
+
+
+class ConcurrentBloomFilter(BloomFilter):
+    """
+    Bloom filter safe to share between threads without a lock, storing one byte per bit.
+
+    With packed bits, setting bit i is a read-modify-write of its byte: two threads
+    setting different bits of the same byte can both read the old value, and one bit
+    is lost, causing a false negative. Here setting a bit is a single store of 1, so
+    concurrent adds can't undo each other and adding a key twice is harmless. It costs
+    8x the memory of BloomFilter. Lookups take no lock either: a key is reported present
+    once all its bytes are stored, and bits are never cleared.
+    """
+
+    _KIND = 3
+
+    def __init__(self, expected_items: int, fp_rate: float, hash_fn: Hash = None):
+        super().__init__(expected_items, fp_rate, hash_fn)
+        self._bits = bytearray(self.m)
+
+    def add(self, s: Key) -> None:
+        self._check_writable()
+        for i in self._indexes(s):
+            self._bits[i] = 1
+
+    def contains(self, s: Key) -> bool:
+        return all(self._bits[i] for i in self._indexes(s))
+
+    def _popcount(self) -> int:
+        return int(np.count_nonzero(self._view))
+
+    def _set(self, indexes: np.ndarray) -> None:
+        # plain stores, so unlike the bitwise_or.at of packed bits no byte is read first
+        self._view[indexes] = 1
+
+    def _test(self, indexes: np.ndarray) -> np.ndarray:
+        return self._view[indexes].all(axis=1)
+
+
+class StripedBloomFilter(BloomFilter):
+    """
+    Bloom filter with packed bits whose writers take one of a fixed set of locks.
+
+    Byte b is guarded by lock b % stripes, so threads setting bits in different
+    stripes don't contend, and a batch takes each stripe's lock once for all its
+    bytes. Same memory as BloomFilter; lookups take no lock, as bits are never cleared.
+    """
+
+    _KIND = 4
+
+    def __init__(self, expected_items: int, fp_rate: float, hash_fn: Hash = None, stripes: int = _STRIPES):
+        super().__init__(expected_items, fp_rate, hash_fn)
+        self._locks = self._make_locks(stripes)
+
+    @classmethod
+    def _restore(cls, m: int, k: int, hash_fn: Hash, bits: memoryview) -> "StripedBloomFilter":
+        bf = super()._restore(m, k, hash_fn, bits)
+        bf._locks = cls._make_locks(_STRIPES)
+        return bf
+
+    @staticmethod
+    def _make_locks(stripes: int) -> List[threading.Lock]:
+        return [threading.Lock() for _ in range(stripes)]
+
+    def add(self, s: Key) -> None:
+        self._check_writable()
+        stripes = len(self._locks)
+        for i in self._indexes(s):
+            with self._locks[(i >> 3) % stripes]:
+                self._bits[i >> 3] |= 1 << (i & 7)
+
+    def _set(self, indexes: np.ndarray) -> None:
+        indexes = indexes.ravel()
+        byte = indexes >> 3
+        stripe = byte % np.uint64(len(self._locks))
+        order = np.argsort(stripe, kind="stable")
+        byte, masks, stripe = byte[order], (1 << (indexes[order] & 7)).astype(np.uint8), stripe[order]
+
+        view = self._view
+        bounds = np.flatnonzero(np.diff(stripe)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(stripe)]):
+            with self._locks[int(stripe[start])]:
+                np.bitwise_or.at(view, byte[start:end], masks[start:end])
@@ -0,0 +1,109 @@
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from main import Bloom, Hash, Key, MurmurHash
+
+_MAX_ATTEMPTS = 100
+_MASK64 = (1 << 64) - 1
+
+
+class XorFilter(Bloom):
+    """
+    Static xor filter (Graf & Lemire, 2020), built once from the full key set.
+
+    Each key maps to three slots, one per third of the table, and the table is
+    solved so that the xor of those slots equals the key's fingerprint. Solving
+    works by peeling: repeatedly take a slot used by exactly one remaining key,
+    then assign slots in reverse peeling order. It needs about 1.23 * fingerprint_bits
+    bits per key for a false-positive rate of 2^-fingerprint_bits, less than a Bloom
+    filter at the same rate, but keys cannot be added after construction.
+    """
+
+    def __init__(self, keys: Iterable[Key], fingerprint_bits: int = 8, hash_fn: Hash = None):
+        if fingerprint_bits not in (8, 16):
+            raise ValueError("fingerprint_bits must be 8 or 16")
+
+        self._hash_fn = hash_fn if hash_fn is not None else MurmurHash()
+        self._dtype = np.uint8 if fingerprint_bits == 8 else np.uint16
+        # duplicate keys would share all three slots and could never be peeled
+        digests = np.unique(self._hash_fn.hash_many(list(keys)).view([("low", "<u8"), ("high", "<u8")]))
+        digests = digests.view("<u8").reshape(-1, 2)
+
+        self._segment = (int(1.23 * len(digests)) + 32) // 3
+        for seed in range(_MAX_ATTEMPTS):
+            self._seed = seed
+            slots = self._slots(digests)
+            order = self._peel(slots)
+            if order is not None:
+                break
+        else:
+            raise RuntimeError(f"could not build the xor filter in {_MAX_ATTEMPTS} attempts")
+
+        fingerprints = self._fingerprints(digests)
+        table = np.zeros(3 * self._segment, dtype=self._dtype)
+        for peeled, slot in reversed(order):
+            a, b, c = slots[peeled].T
+            table[slot] = fingerprints[peeled] ^ table[a] ^ table[b] ^ table[c]
+        self._table = table
+
+    def add(self, s: Key) -> None:
+        raise TypeError("XorFilter is static; build it from the full key set")
+
+    def contains(self, s: Key) -> bool:
+        return bool(self.contains_many([s])[0])
+
+    def contains_many(self, keys: Iterable[Key]) -> np.ndarray:
+        digests = self._hash_fn.hash_many(list(keys))
+        slots = self._slots(digests)
+        table = self._table
+        return (table[slots[:, 0]] ^ table[slots[:, 1]] ^ table[slots[:, 2]]) == self._fingerprints(digests)
+
+    def _slots(self, digests: np.ndarray) -> np.ndarray:
+        # the low hash half, remixed with the attempt's seed (splitmix64 finalizer)
+        # the seed's multiple is wrapped in Python; numpy warns on scalar overflow
+        x = digests[:, 0] + np.uint64((self._seed * 0x9E3779B97F4A7C15) & _MASK64)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+
+        segment = np.uint64(self._segment)
+        slots = np.empty((len(digests), 3), dtype=np.int64)
+        for i, rotation in enumerate((0, 21, 42)):
+            r = (x << np.uint64(rotation)) | (x >> np.uint64((64 - rotation) % 64))
+            # (32-bit value * segment) >> 32 maps into [0, segment) without a division
+            slots[:, i] = ((r & np.uint64(0xFFFFFFFF)) * segment >> np.uint64(32)) + segment * np.uint64(i)
+        return slots
+
+    def _fingerprints(self, digests: np.ndarray) -> np.ndarray:
+        return digests[:, 1].astype(self._dtype)
+
+    def _peel(self, slots: np.ndarray) -> Optional[List[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        (keys, slots) peeled per round, or None when some keys can't be peeled.
+
+        All slots used by exactly one key are peeled in the same round. Those keys
+        never use each other's peeled slots, so each round can be assigned at once.
+        """
+        size = 3 * self._segment
+        flat = slots.ravel()
+        counts = np.bincount(flat, minlength=size)
+        # xor of the keys using each slot; once a slot has one key left, this is that key
+        keys = np.zeros(size, dtype=np.int64)
+        np.bitwise_xor.at(keys, flat, np.arange(len(flat)) // 3)
+
+        order = []
+        remaining = len(slots)
+        while remaining:
+            single = np.flatnonzero(counts == 1)
+            if len(single) == 0:
+                return None
+            # a key may own several single slots; peel it through the first only
+            peeled, first = np.unique(keys[single], return_index=True)
+            order.append((peeled, single[first]))
+            remaining -= len(peeled)
+
+            used = slots[peeled].ravel()
+            counts -= np.bincount(used, minlength=size)
+            np.bitwise_xor.at(keys, used, np.repeat(peeled, 3))
+        return order
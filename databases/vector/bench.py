@@ -0,0 +1,126 @@
+"""
+Benchmarks for VectorDatabase on synthetic clustered embeddings, so no model
+server is needed. Run with: python bench.py
+"""
+
+import os
+import time
+import zlib
+from typing import List
+
+import numpy as np
+
+from embedders import CachedEmbedder
+from quantization import Int8Quantizer, ProductQuantizer
+from vector import VectorDatabase
+
+COUNT = 100_000
+DIM = 256
+QUERIES = 100
+K = 10
+
+
+class SyntheticEmbedder:
+    """Deterministic embeddings scattered around a fixed set of topic centres."""
+
+    model = "synthetic"
+
+    def __init__(self, dim: int = DIM, topics: int = 1000, seed: int = 0):
+        self._dim = dim
+        self._centres = np.random.default_rng(seed).standard_normal((topics, dim)).astype(np.float32)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.empty((len(texts), self._dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            rng = np.random.default_rng(zlib.crc32(text.encode()))
+            out[i] = self._centres[rng.integers(len(self._centres))] + 0.6 * rng.standard_normal(self._dim)
+        return out
+
+
+EMBEDDER = CachedEmbedder(SyntheticEmbedder(), max_bytes=1 << 30)
+DOCS = [f"doc-{i}" for i in range(COUNT)]
+QUERY_TEXTS = [f"query-{i}" for i in range(QUERIES)]
+
+
+def build() -> VectorDatabase:
+    db = VectorDatabase(EMBEDDER)
+    db.add_many(DOCS, batch_size=4096)
+    return db
+
+
+def run_queries(db: VectorDatabase):
+    start = time.perf_counter()
+    results = [db.search(query, K) for query in QUERY_TEXTS]
+    return results, (time.perf_counter() - start) / len(QUERY_TEXTS) * 1000
+
+
+def recall(results: List[List[str]], truth: List[List[str]]) -> float:
+    found = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return found / sum(len(t) for t in truth)
+
+
+def bench_quantization() -> None:
+    truth, float_ms = run_queries(build())
+
+    print(f"{COUNT} x {DIM}-d vectors, recall@{K} against float32 brute force")
+    print(f"{'mode':<20}{'bytes/vector':>14}{'ms/query':>10}{'recall':>8}")
+    print(f"{'float32':<20}{DIM * 4:>14}{float_ms:>10.2f}{1.0:>8.3f}")
+
+    modes = [
+        ("int8 + rerank", Int8Quantizer, True),
+        ("int8", Int8Quantizer, False),
+        ("pq m=32 + rerank", lambda: ProductQuantizer(m=32), True),
+        ("pq m=32", lambda: ProductQuantizer(m=32), False),
+        ("pq m=8", lambda: ProductQuantizer(m=8), False),
+    ]
+    for name, quantizer, keep_full in modes:
+        db = build()
+        db.compress(quantizer(), keep_full=keep_full)
+        results, ms = run_queries(db)
+        print(f"{name:<20}{db.memory_per_vector():>14}{ms:>10.2f}{recall(results, truth):>8.3f}")
+
+
+def bench_search_many() -> None:
+    db = build()
+    db.search_many(QUERY_TEXTS)
+
+    start = time.perf_counter()
+    for query in QUERY_TEXTS:
+        db.search(query, K)
+    one_by_one = time.perf_counter() - start
+
+    start = time.perf_counter()
+    db.search_many(QUERY_TEXTS, K)
+    batched = time.perf_counter() - start
+
+    print(f"{QUERIES} queries over {COUNT} vectors: search {one_by_one * 1000:.1f} ms, "
+          f"search_many {batched * 1000:.1f} ms ({one_by_one / batched:.1f}x)")
+
+
+def bench_sharding() -> None:
+    db = build()
+    db.search_many(QUERY_TEXTS)
+
+    def queries_per_second() -> float:
+        start = time.perf_counter()
+        for query in QUERY_TEXTS:
+            db.search(query, K)
+        return len(QUERY_TEXTS) / (time.perf_counter() - start)
+
+    print(f"search over {COUNT} vectors ({os.cpu_count()} cpus)")
+    print(f"{'mode':<24}{'queries/s':>10}")
+    print(f"{'single process':<24}{queries_per_second():>10.1f}")
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        db.shard(workers)
+        print(f"{f'{workers} shards / workers':<24}{queries_per_second():>10.1f}")
+        workers *= 2
+    db.unshard()
+
+
+if __name__ == '__main__':
+    bench_quantization()
+    print()
+    bench_search_many()
+    print()
+    bench_sharding()
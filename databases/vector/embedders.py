@@ -0,0 +1,138 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Protocol, Tuple
+
+import numpy as np
+import ollama
+
+
+class Embedder(Protocol):
+    model: str
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Returns one float32 row per text."""
+        ...
+
+
+class OllamaEmbedder:
+    def __init__(self, model: str = "embeddinggemma"):
+        self.model = model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = ollama.embed(
+            model=self.model,
+            input=texts,
+        )
+        return np.asarray(response.embeddings, dtype=np.float32)
+
+
+class CachedEmbedder:
+    """
+    Content-addressed cache in front of another embedder.
+
+    Entries are keyed by (model, sha256(text)) and kept in an in-memory LRU that
+    evicts the least recently used vectors once max_bytes is exceeded. With a
+    cache_dir, vectors are also written through to disk so they survive restarts.
+    The disk tier is not bounded: it grows by one small file per distinct text and
+    model, and can be pruned or deleted at any time, as a missing or unreadable
+    file is just a miss.
+    """
+
+    def __init__(self, embedder: Embedder, max_bytes: int = 256 * 1024 * 1024, cache_dir: Optional[str] = None):
+        self.model = embedder.model
+        self._embedder = embedder
+        self._max_bytes = max_bytes
+        self._cache_dir = cache_dir
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        keys = [(self.model, hashlib.sha256(text.encode()).hexdigest()) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+
+        # disk reads and writes happen outside the lock, so other threads keep hitting memory
+        loaded = {}
+        for key in keys:
+            if key not in found and key not in loaded:
+                vector = self._load(key)
+                if vector is not None:
+                    loaded[key] = vector
+        found.update(loaded)
+
+        # duplicates within the batch are embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        computed = {}
+        if missing:
+            vectors = self._embedder.embed(list(missing.values()))
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+            found.update(computed)
+
+        with self._lock:
+            for key, vector in {**loaded, **computed}.items():
+                self._remember(key, vector)
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        for key, vector in computed.items():
+            self._store(key, vector)
+        return np.stack([found[key] for key in keys])
+
+    def _load(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            return np.load(path)
+        except (OSError, ValueError, EOFError):
+            # missing, or truncated or corrupted by a crash
+            return None
+
+    def _store(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        path = self._path(key)
+        if path is None:
+            return
+        # written under a name unique to this writer, then renamed into place, so
+        # readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, vector)
+            os.replace(tmp_path, path)
+        except OSError:
+            # the disk tier is optional: a full disk or unwritable cache_dir just means a later miss
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        if key in self._entries:
+            return
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self._max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _path(self, key: Tuple[str, str]) -> Optional[str]:
+        if self._cache_dir is None:
+            return None
+        model, digest = key
+        safe_model = model.replace("/", "_").replace(":", "_")
+        return os.path.join(self._cache_dir, safe_model, digest[:2], digest + ".npy")
@@ -0,0 +1,106 @@
+import json
+from array import array
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# values JSON round-trips unchanged, indexed without further checks
+_SCALARS = (str, int, float, bool)
+
+
+class MetadataIndex:
+    """
+    Per-field inverted index from metadata value to the rows carrying it.
+
+    A where clause maps fields to a value, or to a list of accepted values. Values
+    within a field are OR-ed and fields are AND-ed into one boolean row mask, so a
+    filtered search only scores the rows that can match. A metadata value that is a
+    list (or tuple) is indexed under each of its elements, so {"tags": ["a", "b"]}
+    matches both where={"tags": "a"} and where={"tags": "b"}.
+
+    The postings are built on the first mask() call, and the rows of a saved store
+    are parsed on first use, so opening a store doesn't pay for either.
+    """
+
+    def __init__(self):
+        self._rows: Optional[List[Optional[Dict[str, Any]]]] = []
+        # rows of a saved store not parsed yet: how many, and their metadata.jsonl
+        self._saved = 0
+        self._source: Optional[bytes] = None
+        self._postings: Optional[Dict[str, Dict[Hashable, array]]] = None
+
+    @classmethod
+    def load(cls, source: Optional[bytes], count: int) -> "MetadataIndex":
+        """Index over count saved rows, parsed from source on first use; None when no row has metadata."""
+        index = cls()
+        index._rows, index._saved, index._source = None, count, source
+        return index
+
+    def __len__(self) -> int:
+        return self._saved if self._rows is None else len(self._rows)
+
+    def __getitem__(self, row: int) -> Optional[Dict[str, Any]]:
+        if self._rows is None and self._source is None and 0 <= row < self._saved:
+            return None
+        return self._load()[row]
+
+    def append(self, metadata: Optional[Dict[str, Any]]) -> None:
+        # every value is checked before anything is stored, so a rejected row leaves no trace
+        keys = self.keys(metadata)
+        rows = self._load()
+        rows.append(metadata)
+        if self._postings is not None:
+            self._post(len(rows) - 1, keys)
+
+    def extend(self, metadata: List[Optional[Dict[str, Any]]]) -> None:
+        for m in metadata:
+            self.append(m)
+
+    @staticmethod
+    def keys(metadata: Optional[Dict[str, Any]]) -> List[Tuple[str, Hashable]]:
+        """(field, value) pairs a row is indexed under; raises TypeError for values that can't be indexed."""
+        keys = []
+        for field, value in (metadata or {}).items():
+            # tuples come back from a saved store as lists, so both are indexed per element
+            if value is None or type(value) in _SCALARS:
+                keys.append((field, value))
+                continue
+            for v in value if isinstance(value, (list, tuple)) else [value]:
+                if not isinstance(v, Hashable) or isinstance(v, tuple):
+                    raise TypeError(f"metadata field {field!r} has unindexable value {v!r}")
+                keys.append((field, v))
+        return keys
+
+    def mask(self, where: Dict[str, Any], size: int) -> np.ndarray:
+        if self._postings is None:
+            self._postings = {}
+            for row, metadata in enumerate(self._load()):
+                self._post(row, self.keys(metadata))
+
+        out = np.ones(size, dtype=bool)
+        for field, accepted in where.items():
+            if not isinstance(accepted, (list, tuple, set, frozenset)):
+                accepted = [accepted]
+            postings = self._postings.get(field, {})
+
+            matches = np.zeros(size, dtype=bool)
+            for value in accepted:
+                rows = postings.get(value)
+                if rows:
+                    matches[np.frombuffer(rows, dtype=np.int64)] = True
+            out &= matches
+        return out
+
+    def _load(self) -> List[Optional[Dict[str, Any]]]:
+        if self._rows is None:
+            if self._source is None:
+                self._rows = [None] * self._saved
+            else:
+                # one JSON array parses far faster than a json.loads per line
+                self._rows = json.loads(b"[" + self._source.rstrip(b"\n").replace(b"\n", b",") + b"]")
+            self._saved, self._source = 0, None
+        return self._rows
+
+    def _post(self, row: int, keys: List[Tuple[str, Hashable]]) -> None:
+        for field, value in keys:
+            self._postings.setdefault(field, {}).setdefault(value, array("q")).append(row)
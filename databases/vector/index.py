@@ -0,0 +1,90 @@
+from array import array
+from typing import List
+
+import numpy as np
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0, spherical: bool = True) -> np.ndarray:
+    """
+    Lloyd's k-means. The spherical variant suits unit-length rows: points are
+    assigned by dot product and centroids are re-normalized after every update.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign(vectors, centroids, spherical=spherical)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.stack([np.bincount(assignments, weights=column, minlength=k) for column in vectors.T], axis=1)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # re-seed empty clusters so every list stays useful
+        empty = np.flatnonzero(~filled)
+        centroids[empty] = vectors[rng.integers(len(vectors), size=len(empty))]
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            centroids /= norms
+    return centroids
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536, spherical: bool = True) -> np.ndarray:
+    """Nearest centroid for every row, chunked to bound the size of the score matrix."""
+    # argmin |x - c|^2 == argmax (x.c - |c|^2 / 2); for unit centroids the second term is constant
+    bias = 0 if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        out[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T - bias, axis=1)
+    return out
+
+
+class IVFIndex:
+    """
+    Inverted-file index with a flat (uncompressed) payload.
+
+    A k-means coarse quantizer splits the rows into nlist inverted lists. A query
+    only scores the rows in its nprobe closest lists, so raising nprobe trades
+    latency for recall.
+    """
+
+    def __init__(self, nlist: int = 100, nprobe: int = 8, max_training_points: int = 256):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._max_training_points = max_training_points
+        self._centroids = None
+        self._lists: List[array] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def train(self, vectors: np.ndarray) -> None:
+        nlist = min(self.nlist, len(vectors))
+        sample = vectors
+        limit = nlist * self._max_training_points
+        if len(vectors) > limit:
+            rows = np.random.default_rng(0).choice(len(vectors), size=limit, replace=False)
+            sample = vectors[rows]
+
+        self._centroids = kmeans(sample, nlist)
+        self._lists = [array("q") for _ in range(nlist)]
+        self.add(vectors, 0)
+
+    def add(self, vectors: np.ndarray, first_row: int) -> None:
+        for offset, c in enumerate(assign(vectors, self._centroids)):
+            self._lists[c].append(first_row + offset)
+
+    def remap(self, rows: np.ndarray) -> None:
+        """Renumbers list entries through rows (old row -> new row), dropping entries mapped to -1."""
+        for c, entries in enumerate(self._lists):
+            mapped = rows[np.frombuffer(entries, dtype=np.int64)] if len(entries) else np.empty(0, dtype=np.int64)
+            self._lists[c] = array("q", mapped[mapped >= 0].tobytes())
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        nprobe = min(self.nprobe, len(self._centroids))
+        scores = self._centroids @ query
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        lists = [np.frombuffer(self._lists[c], dtype=np.int64) for c in probe if len(self._lists[c])]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(lists)
@@ -0,0 +1,99 @@
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class ShardSpec(NamedTuple):
+    name: str
+    first_row: int
+    rows: int
+    dim: int
+
+
+# shard views attached by each worker process, keyed by shard number
+_attached: Dict[int, Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+
+def _attach(specs: List[ShardSpec]) -> None:
+    for shard, spec in enumerate(specs):
+        block = shared_memory.SharedMemory(name=spec.name)
+        _attached[shard] = (block, np.ndarray((spec.rows, spec.dim), dtype=np.float32, buffer=block.buf))
+
+
+def _shard_top_k(shard: int, queries: np.ndarray, k: int, mask: Optional[np.ndarray]) -> List[List[Tuple[float, int]]]:
+    """Local top-k of one shard as (score, local row) pairs per query, best first."""
+    _, vectors = _attached[shard]
+    rows = None
+    if mask is not None:
+        rows = np.flatnonzero(mask)
+        vectors = vectors[rows]
+
+    scores = queries @ vectors.T
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return [[] for _ in range(len(queries))]
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    if rows is not None:
+        top = rows[top]
+    return [list(zip(s.tolist(), t.tolist())) for s, t in zip(top_scores, top)]
+
+
+class ShardedSearcher:
+    """
+    Exact search over float32 rows partitioned into shards held in shared memory.
+
+    Every worker process maps all shards once at start-up, so a query only ships
+    the query vectors (and an optional row mask) to the pool. Each shard answers
+    with its local top-k and the results are merged with a heap.
+    """
+
+    def __init__(self, vectors: np.ndarray, n_shards: int, workers: Optional[int] = None):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self._specs: List[ShardSpec] = []
+        bounds = np.linspace(0, len(vectors), n_shards + 1).astype(np.int64)
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            rows, dim = int(last - first), vectors.shape[1]
+            block = shared_memory.SharedMemory(create=True, size=max(rows * dim * 4, 1))
+            np.ndarray((rows, dim), dtype=np.float32, buffer=block.buf)[:] = vectors[first:last]
+            self._blocks.append(block)
+            self._specs.append(ShardSpec(block.name, int(first), rows, dim))
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers or n_shards,
+            initializer=_attach,
+            initargs=(self._specs,),
+        )
+
+    def search(self, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        """Best k global rows for every query, best first."""
+        futures = []
+        for shard, spec in enumerate(self._specs):
+            shard_mask = None if mask is None else mask[spec.first_row:spec.first_row + spec.rows]
+            futures.append(self._pool.submit(_shard_top_k, shard, queries, k, shard_mask))
+
+        per_shard = [future.result() for future in futures]
+        results = []
+        for q in range(len(queries)):
+            streams = [
+                [(score, spec.first_row + row) for score, row in shard_results[q]]
+                for spec, shard_results in zip(self._specs, per_shard)
+            ]
+            best = islice(heapq.merge(*streams, key=lambda pair: -pair[0]), k)
+            results.append(np.array([row for _, row in best], dtype=np.int64))
+        return results
+
+    def close(self) -> None:
+        self._pool.shutdown()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
@@ -0,0 +1,160 @@
+"""
+On-disk layout of a saved VectorDatabase:
+
+    meta.json         count, dimension, next id and the data directory in use
+    data-*/           one directory per save, holding:
+      vectors.f32     raw row-major float32 matrix (count x dim)
+      ids.i64         stable id of every row
+      offsets.i64     count + 1 byte offsets into texts.bin
+      texts.bin       UTF-8 texts laid end to end
+      metadata.jsonl  one JSON object (or null) per row, parsed on first use; absent if no row has any
+
+A save writes and fsyncs a new data directory, then atomically replaces meta.json
+to point at it, so a save interrupted at any point leaves the previous store
+intact. Data directories meta.json no longer points at are removed afterwards.
+Version 1 stores kept the data files next to meta.json and still open.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+VERSION = 2
+# the data files, other than meta.json, that version 1 stores kept at the top level
+_V1_FILES = ("vectors.f32", "ids.i64", "offsets.i64", "texts.bin", "metadata.jsonl")
+
+
+class MappedTexts:
+    """Texts served straight from a memory-mapped blob, with appended texts kept in memory."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+        self._appended: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1 + len(self._appended)
+
+    def __getitem__(self, i: int) -> str:
+        mapped = len(self._offsets) - 1
+        if i < 0:
+            i += len(self)
+        if i >= mapped:
+            return self._appended[i - mapped]
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, text: str) -> None:
+        self._appended.append(text)
+
+    def extend(self, texts: Iterable[str]) -> None:
+        self._appended.extend(texts)
+
+
+class Store(NamedTuple):
+    vectors: np.ndarray
+    texts: MappedTexts
+    # metadata.jsonl as read, or None when no row has metadata
+    metadata: Optional[bytes]
+    ids: np.ndarray
+    next_id: int
+
+
+def save(
+        path: str,
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadata: Sequence[Optional[Dict[str, Any]]],
+        ids: np.ndarray,
+        next_id: int,
+) -> None:
+    os.makedirs(path, exist_ok=True)
+    data = tempfile.mkdtemp(prefix="data-", dir=path)
+    # mkdtemp makes it private to its owner; other readers of the store need it too
+    os.chmod(data, 0o755)
+
+    encoded = [text.encode() for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    _write(os.path.join(data, "vectors.f32"), np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+    _write(os.path.join(data, "ids.i64"), np.ascontiguousarray(ids, dtype=np.int64).tobytes())
+    _write(os.path.join(data, "offsets.i64"), offsets.tobytes())
+    _write(os.path.join(data, "texts.bin"), b"".join(encoded))
+    if any(m is not None for m in metadata):
+        _write(os.path.join(data, "metadata.jsonl"), "".join(json.dumps(m) + "\n" for m in metadata).encode())
+    _fsync_dir(data)
+
+    meta = {
+        "version": VERSION,
+        "count": len(vectors),
+        "dim": vectors.shape[1],
+        "next_id": next_id,
+        "data": os.path.basename(data),
+    }
+    _write(os.path.join(path, "meta.json"), json.dumps(meta).encode())
+    _fsync_dir(path)
+
+    # the new store is in place; drop what earlier or interrupted saves left behind
+    for name in os.listdir(path):
+        if name.startswith("data-") and name != meta["data"]:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        elif name in _V1_FILES:
+            os.remove(os.path.join(path, name))
+
+
+def open_store(path: str) -> Store:
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] not in (1, VERSION):
+        raise ValueError(f"unsupported store version {meta['version']}")
+    path = os.path.join(path, meta.get("data", ""))
+
+    count, dim = meta["count"], meta["dim"]
+    vectors = _map(os.path.join(path, "vectors.f32"), np.float32, (count, dim))
+    offsets = _map(os.path.join(path, "offsets.i64"), np.int64, (count + 1,))
+    blob = _map(os.path.join(path, "texts.bin"), np.uint8, (int(offsets[-1]),))
+    metadata = None
+    if os.path.exists(os.path.join(path, "metadata.jsonl")):
+        # read now, as a later save may delete the file, but parsed only when needed
+        with open(os.path.join(path, "metadata.jsonl"), "rb") as f:
+            metadata = f.read()
+
+    if os.path.exists(os.path.join(path, "ids.i64")):
+        ids = _map(os.path.join(path, "ids.i64"), np.int64, (count,))
+        next_id = meta["next_id"]
+    else:
+        ids, next_id = np.arange(count, dtype=np.int64), count
+    return Store(vectors, MappedTexts(blob, offsets), metadata, ids, next_id)
+
+
+def _map(path: str, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    # np.memmap refuses zero-length files
+    if 0 in shape:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def _write(path: str, data: bytes) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _fsync_dir(path: str) -> None:
+    """Makes the files created or renamed in the directory at path durable."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
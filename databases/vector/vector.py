@@ -1,43 +1,399 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
 
 import numpy as np
-import ollama
-from sklearn.metrics.pairwise import cosine_similarity
+
+import storage
+from embedders import CachedEmbedder, Embedder, OllamaEmbedder
+from filters import MetadataIndex
+from index import IVFIndex
+from quantization import Quantizer
+from shards import ShardedSearcher
 
 
 class VectorDatabase:
-    def __init__(self):
-        self._data = []
-        self._model = "embeddinggemma"
+    # upper bound on the number of float32 scores materialized per chunk of queries
+    _max_scores = 1 << 24
+
+    def __init__(
+            self,
+            embedder: Optional[Embedder] = None,
+            index: Optional[IVFIndex] = None,
+            compact_threshold: float = 0.3,
+    ):
+        self._texts: List[str] = []
+        self._metadata = MetadataIndex()
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._size = 0
+        # row -> stable id, id -> live row (built lazily for opened stores), and tombstones
+        self._ids = np.empty(0, dtype=np.int64)
+        self._rows: Optional[Dict[int, int]] = {}
+        self._next_id = 0
+        self._deleted = np.empty(0, dtype=bool)
+        self._deleted_count = 0
+        self._compact_threshold = compact_threshold
+        self._shards: Optional[ShardedSearcher] = None
+        self._embedder = embedder if embedder is not None else CachedEmbedder(OllamaEmbedder())
+        self._index = index
+        self._quantizer: Optional[Quantizer] = None
+        self._codes = None
+        self._rerank = 0
+        self._dim = 0
+
+    @classmethod
+    def open(cls, path: str, embedder: Optional[Embedder] = None, index: Optional[IVFIndex] = None) -> "VectorDatabase":
+        """
+        Opens a store written by save() without reading it into memory. Vectors and
+        texts are memory-mapped read-only, so processes opening the same store share
+        the page cache. Adding to an opened store copies the vectors into memory.
+        """
+        db = cls(embedder, index)
+        store = storage.open_store(path)
+        db._vectors, db._texts, db._ids, db._next_id = store.vectors, store.texts, store.ids, store.next_id
+        db._size, db._dim = db._vectors.shape
+        db._metadata = MetadataIndex.load(store.metadata, db._size)
+        db._rows = None
+        db._deleted = np.zeros(db._size, dtype=bool)
+        return db
+
+    def save(self, path: str) -> None:
+        """Writes the live rows; deleted rows are dropped from the saved store."""
+        if self._vectors is None:
+            raise ValueError("cannot save a database whose full-precision vectors were dropped")
+        live = self._live_rows()
+        storage.save(
+            path,
+            self._vectors[live],
+            [self._texts[i] for i in live],
+            [self._metadata[i] for i in live],
+            self._ids[live],
+            self._next_id,
+        )
+
+    @property
+    def index(self) -> Optional[IVFIndex]:
+        return self._index
 
-    def add(self, text):
+    def add(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Stores text and returns its id, which stays valid across updates and compaction."""
+        MetadataIndex.keys(metadata)
         vector = self._embed(text)
-        self._data.append([text, vector])
+        item_id = int(self._append(self._normalize(vector[None, :]))[0])
+        self._texts.append(text)
+        self._metadata.append(metadata)
+        return item_id
 
-    def search(self, text: str, max_items: int = 5) -> List[str]:
-        search_term_embedding = self._embed(text)
-        A = np.array([search_term_embedding])
+    def add_many(
+            self,
+            texts: Iterable[str],
+            batch_size: int = 64,
+            workers: int = 1,
+            metadata: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> List[int]:
+        texts = list(texts)
+        if not texts:
+            return []
+        if metadata is None:
+            metadata = [None] * len(texts)
+        elif len(metadata) != len(texts):
+            raise ValueError(f"got {len(metadata)} metadata entries for {len(texts)} texts")
+        for m in metadata:
+            MetadataIndex.keys(m)
 
-        similarity_scores = []
-        for (datum, vector) in self._data:
-            B = np.array([vector])
-            score = cosine_similarity(A, B)
-            similarity_scores.append([score, datum])
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                embeddings = list(pool.map(self._embed_many, batches))
+        else:
+            embeddings = [self._embed_many(batch) for batch in batches]
 
-        similarity_scores.sort(reverse=True)
-        return [t for _, t in similarity_scores][:max_items]
+        vectors = np.concatenate(embeddings)
+        ids = self._append(self._normalize(vectors))
+        self._texts.extend(texts)
+        self._metadata.extend(metadata)
+        return ids.tolist()
 
-    def _embed(self, text):
-        response = ollama.embed(
-            model=self._model,
-            input=text,
-        )
-        return response.embeddings[0]
+    def update(self, item_id: int, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Replaces the text of item_id, keeping its metadata unless new metadata is given."""
+        row = self._row_of(item_id)
+        if metadata is None:
+            metadata = self._metadata[row]
+        MetadataIndex.keys(metadata)
+        vector = self._embed(text)
+
+        # the old row is only dropped once its replacement is in place
+        self._append(self._normalize(vector[None, :]), np.array([item_id], dtype=np.int64))
+        self._texts.append(text)
+        self._metadata.append(metadata)
+        self._tombstone(row)
+        self._maybe_compact()
+
+    def delete(self, item_id: int) -> None:
+        row = self._row_of(item_id)
+        self._tombstone(row)
+        del self._rows[item_id]
+        self._maybe_compact()
+
+    def compact(self) -> None:
+        """Drops deleted rows from every row-aligned structure and renumbers the rest."""
+        if self._deleted_count == 0:
+            return
+
+        self.unshard()
+        live = self._live_rows()
+        remap = np.full(self._size, -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+
+        if self._vectors is not None:
+            self._vectors = self._vectors[live]
+        if self._codes is not None:
+            self._codes = self._codes[live]
+        if self._index is not None and self._index.is_trained:
+            self._index.remap(remap)
+
+        self._texts = [self._texts[i] for i in live]
+        metadata = MetadataIndex()
+        metadata.extend([self._metadata[i] for i in live])
+        self._metadata = metadata
+
+        self._ids = self._ids[live]
+        self._rows = {int(item_id): row for row, item_id in enumerate(self._ids)}
+        self._deleted = np.zeros(len(live), dtype=bool)
+        self._deleted_count = 0
+        self._size = len(live)
+
+    def search(self, text: str, max_items: int = 5, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Returns the max_items stored texts most similar to text. where restricts the
+        search to rows whose metadata matches, e.g. {"tenant": "acme", "tag": ["a", "b"]}.
+        """
+        if self._size == 0:
+            return []
+
+        query = self._normalize(self._embed(text)[None, :])
+        return [self._texts[i] for i in self._top_k(query, max_items, mask=self._mask(where))[0]]
+
+    def search_many(self, texts: List[str], max_items: int = 5, where: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+        """
+        search() for many queries at once: the queries are embedded in one batch and
+        scored with one matrix-matrix product per chunk of queries.
+        """
+        if not texts:
+            return []
+        if self._size == 0:
+            return [[] for _ in texts]
+
+        queries = self._normalize(self._embed_many(texts))
+        return [[self._texts[i] for i in top] for top in self._top_k(queries, max_items, mask=self._mask(where))]
+
+    def build_index(self) -> None:
+        """Trains the approximate index on the rows stored so far; later adds are assigned incrementally."""
+        if self._index is None:
+            raise ValueError("this database was created without an index")
+        if self._size == 0:
+            raise ValueError("cannot train an index on an empty database")
+        if self._vectors is None:
+            raise ValueError("cannot train an index without the full-precision vectors")
+        self._index.train(self._vectors[:self._size])
+
+    def compress(self, quantizer: Quantizer, keep_full: bool = True, rerank: int = 4) -> None:
+        """
+        Trains the quantizer on the stored rows and scores searches against its codes
+        from then on. With keep_full, the float32 rows are kept and used to rerank the
+        best rerank * max_items candidates; without it they are dropped to save memory.
+        """
+        if self._size == 0:
+            raise ValueError("cannot train a quantizer on an empty database")
+        vectors = self._vectors[:self._size]
+        quantizer.train(vectors)
+        self._codes = quantizer.encode(vectors)
+        self._quantizer = quantizer
+        self._rerank = rerank
+        if not keep_full:
+            self._vectors = None
+
+    def shard(self, n_shards: int, workers: Optional[int] = None) -> None:
+        """
+        Copies the float32 rows into n_shards shared-memory blocks and answers exact
+        searches by fanning out to a process pool. Adding rows or compacting drops
+        the shards; call shard() again afterwards.
+        """
+        if self._vectors is None:
+            raise ValueError("sharded search needs the full-precision vectors")
+        self.unshard()
+        self._shards = ShardedSearcher(self._vectors[:self._size], n_shards, workers)
+
+    def unshard(self) -> None:
+        if self._shards is not None:
+            self._shards.close()
+            self._shards = None
+
+    def memory_per_vector(self) -> int:
+        """Bytes held per stored row by the vectors and codes."""
+        total = 0
+        if self._vectors is not None:
+            total += self._vectors[0].nbytes
+        if self._codes is not None:
+            total += self._codes[0].nbytes
+        return total
+
+    def recall_at_k(self, texts: List[str], k: int = 10) -> float:
+        """Fraction of the exact top-k results that the approximate index or quantizer also returns."""
+        if self._vectors is None:
+            raise ValueError("exact search needs the full-precision vectors")
+        queries = self._normalize(self._embed_many(texts))
+        mask = self._mask(None)
+        found, total = 0, 0
+        for exact, approx in zip(self._top_k(queries, k, exact=True, mask=mask), self._top_k(queries, k, mask=mask)):
+            found += len(np.intersect1d(exact, approx))
+            total += len(exact)
+        return found / total if total else 1.0
+
+    def _mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Rows a search may return: live rows matching where, or None when that is every row."""
+        mask = ~self._deleted[:self._size] if self._deleted_count else None
+        if where:
+            matches = self._metadata.mask(where, self._size)
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero(~self._deleted[:self._size])
+
+    def _row_of(self, item_id: int) -> int:
+        if self._rows is None:
+            self._rows = {int(i): row for row, i in enumerate(self._ids[:self._size]) if not self._deleted[row]}
+        if item_id not in self._rows:
+            raise KeyError(item_id)
+        return self._rows[item_id]
+
+    def _tombstone(self, row: int) -> None:
+        self._deleted[row] = True
+        self._deleted_count += 1
+
+    def _maybe_compact(self) -> None:
+        if self._deleted_count >= self._compact_threshold * self._size:
+            self.compact()
+
+    def _top_k(
+            self,
+            queries: np.ndarray,
+            k: int,
+            exact: bool = False,
+            mask: Optional[np.ndarray] = None,
+    ) -> List[np.ndarray]:
+        """Best k rows for every query, best first."""
+        if not exact and self._index is not None and self._index.is_trained:
+            # every query probes different lists, so they are scored one at a time
+            results = []
+            for query in queries:
+                rows = self._index.candidates(query)
+                if mask is not None:
+                    rows = rows[mask[rows]]
+                results.extend(self._score_top_k(query[None, :], k, exact, rows))
+            return results
+
+        if self._shards is not None and (exact or self._quantizer is None):
+            return self._shards.search(queries, k, mask)
+
+        # pre-filter: only rows that pass the mask are ever scored
+        rows = None if mask is None else np.flatnonzero(mask)
+        n_rows = self._size if rows is None else len(rows)
+        # bound the (queries x rows) score matrix by scoring a chunk of queries at a time
+        step = max(1, self._max_scores // max(n_rows, 1))
+        results = []
+        for start in range(0, len(queries), step):
+            results.extend(self._score_top_k(queries[start:start + step], k, exact, rows))
+        return results
+
+    def _score_top_k(self, queries: np.ndarray, k: int, exact: bool, rows: Optional[np.ndarray]) -> List[np.ndarray]:
+        if exact or self._quantizer is None:
+            vectors = self._vectors[:self._size] if rows is None else self._vectors[rows]
+            # rows are unit length, so the dot product is the cosine similarity
+            return self._select(queries @ vectors.T, k, rows)
+
+        codes = self._codes[:self._size] if rows is None else self._codes[rows]
+        scores = self._quantizer.scores(queries, codes)
+        if self._vectors is None:
+            return self._select(scores, k, rows)
+
+        # rerank the best approximate candidates with full-precision scores
+        return [
+            self._select((self._vectors[candidates] @ query)[None, :], k, candidates)[0]
+            for query, candidates in zip(queries, self._select(scores, self._rerank * k, rows))
+        ]
+
+    @staticmethod
+    def _select(scores: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        """Positions of the k best scores in every row of scores, best first, mapped through rows when given."""
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [np.empty(0, dtype=np.int64) for _ in range(len(scores))]
+
+        # O(n) selection of the k best, then sort only those k
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return list(top if rows is None else rows[top])
+
+    def _append(self, vectors: np.ndarray, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Appends row-aligned vectors, codes, ids and tombstones; returns the ids of the new rows."""
+        n, dim = vectors.shape
+        if self._size == 0 and self._vectors is not None and self._vectors.shape[1] != dim:
+            self._vectors = np.empty((0, dim), dtype=np.float32)
+        elif dim != self._dim:
+            raise ValueError(f"expected {self._dim}-d vectors, got {dim}-d")
+
+        self.unshard()
+        needed = self._size + n
+        if self._vectors is not None:
+            self._vectors = self._reserve(self._vectors, needed)
+            self._vectors[self._size:needed] = vectors
+        if self._quantizer is not None:
+            self._codes = self._reserve(self._codes, needed)
+            self._codes[self._size:needed] = self._quantizer.encode(vectors)
+        if self._index is not None and self._index.is_trained:
+            self._index.add(vectors, self._size)
+
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+            self._next_id += n
+        self._ids = self._reserve(self._ids, needed)
+        self._ids[self._size:needed] = ids
+        self._deleted = self._reserve(self._deleted, needed)
+        self._deleted[self._size:needed] = False
+        if self._rows is not None:
+            self._rows.update(zip(ids.tolist(), range(self._size, needed)))
+
+        self._size = needed
+        self._dim = dim
+        return ids
+
+    def _reserve(self, buffer: np.ndarray, needed: int) -> np.ndarray:
+        if needed <= len(buffer):
+            return buffer
+        # amortized doubling keeps appends O(1) on average
+        capacity = max(needed, 2 * len(buffer), 16)
+        grown = np.empty((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+        grown[:self._size] = buffer[:self._size]
+        return grown
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _embed(self, text: str) -> np.ndarray:
+        return self._embed_many([text])[0]
+
+    def _embed_many(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._embedder.embed(texts), dtype=np.float32)
 
 
 if __name__ == '__main__':
     vector_db = VectorDatabase()
-    for text in [
+    texts = [
         "The National Weather Service issued a thunderstorm warning for the tri-state area tonight.",
         "Humidity levels are expected to spike, making the afternoon feel significantly warmer than the actual temperature.",
         "A lingering high-pressure system is keeping the skies clear and the winds calm for the weekend.",
@@ -58,8 +414,8 @@ if __name__ == '__main__':
         "A well-balanced diet should include a variety of leafy greens, lean proteins, and healthy fats.",
         "The Metropolitan Museum of Art is hosting a new exhibit featuring 19th-century sculpture.",
         "Regular software updates are essential for maintaining the security of your personal devices."
-    ]:
-        vector_db.add(text)
+    ]
+    vector_db.add_many(texts)
 
     items = vector_db.search("Weather")
     for item in items:
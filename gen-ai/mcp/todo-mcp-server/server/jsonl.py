@@ -2,31 +2,79 @@
 
 import json
 import os
+from typing import Iterator
 
 
-def read_jsonl(file_path: str) -> list[dict]:
-    """Reads a JSONL file and returns a list of JSON objects.
+def iter_jsonl(file_path: str) -> Iterator[dict]:
+    """Yields the JSON objects of a JSONL file one line at a time.
 
     Args:
         file_path: The path to the JSONL file.
 
-    Returns:
-        A list of dictionaries. Returns empty list if file doesn't exist.
+    Yields:
+        One dictionary per non-empty line. Yields nothing if file doesn't exist.
     """
     if not os.path.exists(file_path):
-        return []
+        return
 
-    items = []
     with open(file_path, "r") as f:
         for line in f:
             line = line.strip()
             if line:
-                items.append(json.loads(line))
-    return items
+                yield json.loads(line)
+
+
+def iter_jsonl_from(file_path: str, offset: int = 0) -> Iterator[tuple[dict, int]]:
+    """Yields the JSON objects of a JSONL file starting at a byte offset.
+
+    A last line without a trailing newline is yielded if it parses, as files
+    written before the log format may end that way; otherwise it is a fragment
+    left by an interrupted write, and is left unread.
+
+    Args:
+        file_path: The path to the JSONL file.
+        offset: The byte offset to start at; the end of a line read earlier.
+
+    Yields:
+        Each dictionary with the byte offset just past its line, to resume from.
+        Yields nothing if file doesn't exist.
+    """
+    if not os.path.exists(file_path):
+        return
+
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    return
+                yield record, offset + len(line)
+                return
+            offset += len(line)
+            if line.strip():
+                yield json.loads(line), offset
+
+
+def read_jsonl(file_path: str) -> list[dict]:
+    """Reads a JSONL file and returns a list of JSON objects.
+
+    Args:
+        file_path: The path to the JSONL file.
+
+    Returns:
+        A list of dictionaries. Returns empty list if file doesn't exist.
+    """
+    return list(iter_jsonl(file_path))
 
 
 def write_jsonl(items: list[dict], file_path: str) -> None:
-    """Writes an array of JSON objects to a JSONL file.
+    """Atomically replaces a JSONL file with an array of JSON objects.
+
+    The items are written to a temporary file next to file_path, fsynced, and
+    renamed over it, so after a crash the file holds either the old or the new
+    items, never a partial write.
 
     Args:
         items: A list of dictionaries to write.
@@ -34,13 +82,18 @@ def write_jsonl(items: list[dict], file_path: str) -> None:
     """
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-    with open(file_path, "w") as f:
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w") as f:
         for item in items:
             f.write(json.dumps(item) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+    _fsync_dir(file_path)
 
 
 def append_jsonl(item: dict, file_path: str) -> None:
-    """Appends a single JSON object to a JSONL file.
+    """Appends a single JSON object to a JSONL file and fsyncs it.
 
     Args:
         item: A dictionary to append.
@@ -50,3 +103,40 @@ def append_jsonl(item: dict, file_path: str) -> None:
 
     with open(file_path, "a") as f:
         f.write(json.dumps(item) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def extend_jsonl(items: list[dict], file_path: str) -> int:
+    """Appends JSON objects to a JSONL file with one write and one fsync.
+
+    If the file doesn't end with a newline, one is written first, so its last
+    line isn't joined to the first new one.
+
+    Args:
+        items: A list of dictionaries to append.
+        file_path: The path to the JSONL file.
+
+    Returns:
+        The size of the file after the append.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    with open(file_path, "a+b") as f:
+        data = "".join(json.dumps(item) + "\n" for item in items).encode()
+        size = f.seek(0, os.SEEK_END)
+        if size and os.pread(f.fileno(), 1, size - 1) != b"\n":
+            data = b"\n" + data
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def _fsync_dir(file_path: str) -> None:
+    """Makes a rename in file_path's directory durable."""
+    fd = os.open(os.path.dirname(file_path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
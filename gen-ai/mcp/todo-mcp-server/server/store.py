@@ -0,0 +1,365 @@
+"""In-memory to-do store backed by an append-only JSONL mutation log."""
+
+import asyncio
+import fcntl
+import os
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from contextlib import contextmanager
+from enum import Enum
+from functools import partial
+from typing import Any, Iterator
+
+from .jsonl import extend_jsonl, iter_jsonl, iter_jsonl_from, write_jsonl
+
+
+class Status(str, Enum):
+    ACTIVE = "Active"
+    COMPLETED = "Completed"
+
+
+class Op(str, Enum):
+    CREATE = "create"
+    COMPLETE = "complete"
+    DELETE = "delete"
+
+
+# a requested mutation: (Op.CREATE, item), (Op.COMPLETE, item_id) or (Op.DELETE, item_id)
+Mutation = tuple[Op, Any]
+
+
+class TodoStore:
+    """To-do items kept in a dict keyed by snowflake id, persisted as a log of mutations.
+
+    The log is read once on construction. Each mutation then appends one record
+    ({"op": "create", **item}, {"op": "complete", "id": ...} or
+    {"op": "delete", "id": ...}) instead of rewriting the file, and lookups never
+    re-read it. Lines without an "op" are items written before the log format,
+    and are replayed as creates.
+
+    Records superseded by later ones (a create followed by a complete, or anything
+    about a deleted item) are garbage. Once they make up compact_threshold of all
+    records, the live items are written to a snapshot file and the log is
+    truncated, so startup reads the snapshot plus the log since then, however long
+    the history. Replay is idempotent: every record sets an item's state rather
+    than changing it, so if a crash lands between replacing the snapshot and
+    truncating the log, replaying that log over the new snapshot gives the same items.
+
+    Item ids are also kept in sorted lists, one over all items and one per status,
+    so pages in snowflake id (i.e. creation time) order are found by bisection.
+
+    Several processes may share the files. Every operation takes an fcntl lock on a
+    lock file next to the log (shared to read, exclusive to write) and first
+    replays the records other processes appended since its last operation,
+    reloading everything if another process's compaction replaced the snapshot.
+    A TodoStore is not thread-safe; AsyncTodoStore shares one between asyncio tasks.
+    """
+
+    def __init__(self, file_path: str, compact_threshold: float = 0.5, min_compact_records: int = 1000):
+        """Loads the store from the snapshot and log at file_path.
+
+        Args:
+            file_path: The path to the JSONL log. Created on the first mutation.
+                The snapshot is kept next to it, e.g. db.snapshot.jsonl for db.jsonl,
+                and so is the lock file, db.jsonl.lock.
+            compact_threshold: The fraction of garbage records that triggers compaction.
+            min_compact_records: Never compact while there are fewer records than this.
+        """
+        self._file_path = file_path
+        root, ext = os.path.splitext(file_path)
+        self._snapshot_path = f"{root}.snapshot{ext}"
+        self._compact_threshold = compact_threshold
+        self._min_compact_records = min_compact_records
+
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self._lock_fd = os.open(file_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        with self._locked(fcntl.LOCK_SH):
+            self._load()
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._items)
+
+    def __contains__(self, item_id: str) -> bool:
+        self._refresh()
+        return item_id in self._items
+
+    def get(self, item_id: str) -> dict | None:
+        """Returns a copy of the item with the given ID, or None if not found."""
+        self._refresh()
+        item = self._items.get(item_id)
+        return dict(item) if item is not None else None
+
+    def items(self) -> list[dict]:
+        """Returns copies of all items in id order."""
+        self._refresh()
+        return [dict(self._items[str(item_id)]) for item_id in self._ids]
+
+    def page(self, status: str | None = None, limit: int = 50, after: str | None = None) -> tuple[list[dict], str | None]:
+        """Returns up to limit items in id order, and the cursor for the next page.
+
+        Args:
+            status: Only return items with this status, or all items if None.
+            limit: The maximum number of items to return.
+            after: Only return items with ids after this one; a cursor from a previous call.
+
+        Returns:
+            Copies of the items, and the id to pass as after for the next page, or None
+            if there are no more items.
+        """
+        self._refresh()
+        ids = self._ids if status is None else self._ids_by_status.get(status, [])
+        start = bisect_right(ids, int(after)) if after is not None else 0
+        selected = ids[start:start + limit]
+        next_cursor = str(selected[-1]) if start + limit < len(ids) else None
+        return [dict(self._items[str(item_id)]) for item_id in selected], next_cursor
+
+    def create(self, item: dict) -> None:
+        """Adds an item, which must have an "id" not already in the store.
+
+        Args:
+            item: The to-do item to add.
+        """
+        if not self.commit([(Op.CREATE, item)])[0]:
+            raise ValueError(f"duplicate to-do item id {item['id']}")
+
+    def complete(self, item_id: str) -> bool:
+        """Marks an item as completed.
+
+        Args:
+            item_id: The ID of the item to complete.
+
+        Returns:
+            True if the item was marked as completed, False if not found.
+        """
+        return self.commit([(Op.COMPLETE, item_id)])[0]
+
+    def delete(self, item_id: str) -> bool:
+        """Deletes an item.
+
+        Args:
+            item_id: The ID of the item to delete.
+
+        Returns:
+            True if the item was deleted, False if not found.
+        """
+        return self.commit([(Op.DELETE, item_id)])[0]
+
+    def commit(self, mutations: list[Mutation]) -> list[bool]:
+        """Applies mutations in order and logs them with a single write and fsync.
+
+        Args:
+            mutations: The mutations to apply; each sees the effect of the ones before it.
+
+        Returns:
+            For each mutation, whether it took effect: False for a create whose id
+            already exists, or a complete or delete of an item not found.
+        """
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up()
+
+            results, records = [], []
+            for op, arg in mutations:
+                if op == Op.CREATE:
+                    record = {"op": op.value, **arg}
+                    applies = arg["id"] not in self._items
+                else:
+                    record = {"op": op.value, "id": arg}
+                    applies = arg in self._items
+                results.append(applies)
+                if applies:
+                    self._apply(record)
+                    records.append(record)
+            if not records:
+                return results
+
+            if os.path.exists(self._file_path) and os.path.getsize(self._file_path) > self._offset:
+                # holding the exclusive lock, the only tail left unreplayed is one that
+                # doesn't parse: a fragment left by a writer that crashed mid-write
+                os.truncate(self._file_path, self._offset)
+            try:
+                self._offset = extend_jsonl(records, self._file_path)
+            except OSError:
+                # memory is ahead of the log; go back to what the files hold
+                self._load()
+                raise
+            self._records += len(records)
+
+            garbage = self._records - len(self._items)
+            if self._records >= self._min_compact_records and garbage >= self._compact_threshold * self._records:
+                self._compact()
+            return results
+
+    def compact(self) -> None:
+        """Writes the live items to the snapshot and truncates the log."""
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up()
+            self._compact()
+
+    def close(self) -> None:
+        os.close(self._lock_fd)
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        fcntl.flock(self._lock_fd, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        with self._locked(fcntl.LOCK_SH):
+            self._catch_up()
+
+    def _load(self) -> None:
+        # called holding the lock
+        self._items: dict[str, dict] = {}
+        self._ids: list[int] = []
+        self._ids_by_status: defaultdict[str, list[int]] = defaultdict(list)
+        # records in the snapshot and log together, live or not
+        self._records = 0
+        # bytes of the log replayed so far
+        self._offset = 0
+        self._snapshot_version = self._version(self._snapshot_path)
+
+        for record in iter_jsonl(self._snapshot_path):
+            self._apply(record)
+            self._records += 1
+        self._catch_up()
+
+    def _catch_up(self) -> None:
+        # called holding the lock
+        compacted = self._version(self._snapshot_path) != self._snapshot_version
+        if compacted or (os.path.exists(self._file_path) and os.path.getsize(self._file_path) < self._offset):
+            self._load()
+            return
+        for record, self._offset in iter_jsonl_from(self._file_path, self._offset):
+            self._apply(record)
+            self._records += 1
+
+    def _compact(self) -> None:
+        # called holding the exclusive lock
+        write_jsonl(list(self._items.values()), self._snapshot_path)
+        if os.path.exists(self._file_path):
+            with open(self._file_path, "r+") as f:
+                f.truncate()
+                os.fsync(f.fileno())
+        self._records = len(self._items)
+        self._offset = 0
+        self._snapshot_version = self._version(self._snapshot_path)
+
+    @staticmethod
+    def _version(file_path: str) -> tuple[int, int, int] | None:
+        """Identifies a file's contents; a file replaced by os.replace gets a new inode."""
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _apply(self, record: dict) -> None:
+        record = dict(record)
+        op = record.pop("op", Op.CREATE.value)
+        item_id = record["id"]
+        if op not in (Op.CREATE.value, Op.COMPLETE.value, Op.DELETE.value):
+            raise ValueError(f"unknown to-do log operation {op!r}")
+
+        item = self._items.pop(item_id, None)
+        if item is not None:
+            self._unindex(item)
+        if op == Op.CREATE.value:
+            item = record
+        elif op == Op.COMPLETE.value and item is not None:
+            item["status"] = Status.COMPLETED.value
+        else:
+            return
+        self._items[item_id] = item
+        self._index(item)
+
+    def _index(self, item: dict) -> None:
+        # snowflakes only grow, so this is usually an append
+        item_id = int(item["id"])
+        insort(self._ids, item_id)
+        insort(self._ids_by_status[item["status"]], item_id)
+
+    def _unindex(self, item: dict) -> None:
+        item_id = int(item["id"])
+        for ids in (self._ids, self._ids_by_status[item["status"]]):
+            del ids[bisect_left(ids, item_id)]
+
+
+class AsyncTodoStore:
+    """Shares a TodoStore between asyncio tasks, committing concurrent mutations together.
+
+    An asyncio lock admits one task at a time to the store, whose blocking file I/O
+    runs in a worker thread. Mutations are queued before the lock is taken, and
+    whichever task gets it commits everything queued so far with one write and
+    fsync, so tasks that piled up behind a commit share the next one.
+    """
+
+    def __init__(self, store: TodoStore):
+        self._store = store
+        self._lock = asyncio.Lock()
+        self._queue: list[tuple[Mutation, asyncio.Future]] = []
+
+    async def page(self, status: str | None = None, limit: int = 50, after: str | None = None) -> tuple[list[dict], str | None]:
+        """See TodoStore.page."""
+        async with self._lock:
+            page = asyncio.get_running_loop().run_in_executor(None, self._store.page, status, limit, after)
+            await self._wait(page)
+        return page.result()
+
+    async def create(self, item: dict) -> None:
+        """See TodoStore.create."""
+        if not await self._commit((Op.CREATE, item)):
+            raise ValueError(f"duplicate to-do item id {item['id']}")
+
+    async def complete(self, item_id: str) -> bool:
+        """See TodoStore.complete."""
+        return await self._commit((Op.COMPLETE, item_id))
+
+    async def delete(self, item_id: str) -> bool:
+        """See TodoStore.delete."""
+        return await self._commit((Op.DELETE, item_id))
+
+    async def _commit(self, mutation: Mutation) -> bool:
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        self._queue.append((mutation, result))
+        try:
+            async with self._lock:
+                if self._queue:
+                    batch, self._queue = self._queue, []
+                    committed = loop.run_in_executor(None, self._store.commit, [m for m, _ in batch])
+                    # resolved by callback, so the batch gets its results even if this task is cancelled
+                    committed.add_done_callback(partial(self._resolve, batch))
+                    await self._wait(committed)
+        except asyncio.CancelledError:
+            # cancelled waiting for the lock: the mutation must not ride along with a later commit
+            self._queue = [(m, future) for m, future in self._queue if future is not result]
+            raise
+        return await result
+
+    @staticmethod
+    def _resolve(batch: list[tuple[Mutation, asyncio.Future]], committed: asyncio.Future) -> None:
+        error = committed.exception()
+        results = committed.result() if error is None else [None] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                # its task was cancelled
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    async def _wait(future: asyncio.Future) -> None:
+        # the caller holds the lock, which must stay held until the store call
+        # returns, even if the caller is cancelled meanwhile; asyncio.wait never
+        # cancels the future itself
+        try:
+            await asyncio.wait([future])
+        except asyncio.CancelledError:
+            await asyncio.wait([future])
+            raise
@@ -1,27 +1,31 @@
 """Tools for the MCP server.
 """
 
+import os
 from datetime import UTC, datetime
-from enum import Enum
+from functools import cache
 
 from snowflake import SnowflakeGenerator
 
-from .jsonl import append_jsonl, read_jsonl, write_jsonl
 from .server import mcp
+from .store import AsyncTodoStore, Status, TodoStore
 
+TODO_DB_PATH = "/Users/girishraman/todos/db.jsonl"
 
-class Status(str, Enum):
-    ACTIVE = "Active"
-    COMPLETED = "Completed"
-
+# server processes may share the database, so each gets its own snowflake instance;
+# pids equal mod 1024 still collide, so a create retries with a fresh id
+_snowflake_gen = SnowflakeGenerator(instance=os.getpid() % 1024)
+_CREATE_ATTEMPTS = 5
 
-TODO_DB_PATH = "/Users/girishraman/todos/db.jsonl"
 
-_snowflake_gen = SnowflakeGenerator(instance=1)
+@cache
+def _store() -> AsyncTodoStore:
+    """The store for TODO_DB_PATH, loaded on first use."""
+    return AsyncTodoStore(TodoStore(TODO_DB_PATH))
 
 
 @mcp.tool()
-def create_todo_item(name: str, description: str) -> str:
+async def create_todo_item(name: str, description: str) -> str:
     """Creates an item to do later.
 
     Args:
@@ -31,32 +35,47 @@ def create_todo_item(name: str, description: str) -> str:
     Returns:
         An identifier for the to-do item just created.
     """
-    item_id = str(next(_snowflake_gen))
-    todo_item = {
-        "id": item_id,
-        "name": name,
-        "description": description,
-        "status": Status.ACTIVE.value,
-        "created_at": datetime.now(UTC).isoformat(),
-    }
-
-    append_jsonl(todo_item, TODO_DB_PATH)
-
-    return item_id
+    for attempt in range(_CREATE_ATTEMPTS):
+        item_id = str(next(_snowflake_gen))
+        todo_item = {
+            "id": item_id,
+            "name": name,
+            "description": description,
+            "status": Status.ACTIVE.value,
+            "created_at": datetime.now(UTC).isoformat(),
+        }
+        try:
+            await _store().create(todo_item)
+        except ValueError:
+            # another process took the same id; a later one won't collide again
+            if attempt == _CREATE_ATTEMPTS - 1:
+                raise
+            continue
+        return item_id
 
 
 @mcp.tool()
-def list_todo_items() -> list[dict]:
-    """Lists all to-do items.
+async def list_todo_items(status: Status | None = None, limit: int = 50, cursor: str | None = None) -> dict:
+    """Lists to-do items, oldest first, one page at a time.
+
+    Args:
+        status: Only list items with this status. Lists all items if omitted.
+        limit: The maximum number of items to return, from 1 to 500.
+        cursor: The next_cursor of the previous page, to continue after it.
 
     Returns:
-        A list of to-do items, each with id, name, description, status, and created_at.
+        A dict with "items", a list of to-do items each with id, name, description,
+        status, and created_at, and "next_cursor", to pass as cursor for the next
+        page, or None if there are no more items.
     """
-    return read_jsonl(TODO_DB_PATH)
+    if not 1 <= limit <= 500:
+        raise ValueError("limit must be between 1 and 500")
+    items, next_cursor = await _store().page(status.value if status is not None else None, limit, cursor)
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @mcp.tool()
-def delete_todo_item(item_id: str) -> bool:
+async def delete_todo_item(item_id: str) -> bool:
     """Deletes a to-do item by its ID.
 
     Args:
@@ -65,19 +84,11 @@ def delete_todo_item(item_id: str) -> bool:
     Returns:
         True if the item was deleted, False if not found.
     """
-    items = read_jsonl(TODO_DB_PATH)
-    filtered = [item for item in items if item["id"] != item_id]
-
-    if len(filtered) == len(items):
-        return False
-
-    write_jsonl(filtered, TODO_DB_PATH)
-
-    return True
+    return await _store().delete(item_id)
 
 
 @mcp.tool()
-def complete_todo_item(item_id: str) -> bool:
+async def complete_todo_item(item_id: str) -> bool:
     """Marks a to-do item as completed.
 
     Args:
@@ -86,18 +97,4 @@ def complete_todo_item(item_id: str) -> bool:
     Returns:
         True if the item was marked as completed, False if not found.
     """
-    items = read_jsonl(TODO_DB_PATH)
-    found = False
-
-    for item in items:
-        if item["id"] == item_id:
-            item["status"] = Status.COMPLETED.value
-            found = True
-            break
-
-    if not found:
-        return False
-
-    write_jsonl(items, TODO_DB_PATH)
-
-    return True
+    return await _store().complete(item_id)
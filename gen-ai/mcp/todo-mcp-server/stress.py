@@ -0,0 +1,88 @@
+"""Stress test for the to-do tools. Run with: python stress.py [calls per process] [processes]
+
+Each process serves the MCP server in memory and fires its calls concurrently
+through a fastmcp Client, every process sharing one database in a temporary
+directory. Half the calls create items; the rest complete and delete some of
+them while paging through the list. The database is then reloaded from disk and
+checked against what every call reported, so a lost or misapplied write fails
+the run.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from fastmcp import Client
+
+
+def worker(db_path: str, calls: int) -> tuple[dict[str, str | None], float]:
+    """Runs one process's calls; returns the expected status of each item it created (None if deleted)."""
+    from server import mcp, tools
+
+    tools.TODO_DB_PATH = db_path
+
+    async def run() -> tuple[dict[str, str | None], float]:
+        async with Client(mcp) as client:
+            async def call(tool: str, **arguments):
+                return (await client.call_tool(tool, arguments)).data
+
+            start = time.perf_counter()
+            ids = await asyncio.gather(*[
+                call("create_todo_item", name=f"item {i}", description=f"stress item {i} of pid {os.getpid()}")
+                for i in range(calls // 2)
+            ])
+            completed, deleted = ids[0::2], ids[1::4]
+            results = await asyncio.gather(
+                *[call("complete_todo_item", item_id=item_id) for item_id in completed],
+                *[call("delete_todo_item", item_id=item_id) for item_id in deleted],
+                *[call("list_todo_items", limit=20) for _ in range(calls - len(ids) - len(completed) - len(deleted))],
+            )
+            elapsed = time.perf_counter() - start
+
+        if not all(results[:len(completed) + len(deleted)]):
+            raise AssertionError("a complete or delete of an existing item returned False")
+        expected = {item_id: tools.Status.ACTIVE.value for item_id in ids}
+        expected.update({item_id: tools.Status.COMPLETED.value for item_id in completed})
+        expected.update({item_id: None for item_id in deleted})
+        return expected, elapsed
+
+    return asyncio.run(run())
+
+
+def main(calls: int, processes: int) -> None:
+    from server.store import TodoStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "db.jsonl")
+        start = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            outcomes = pool.starmap(worker, [(db_path, calls)] * processes)
+        wall = time.perf_counter() - start
+
+        expected = {}
+        for own, _ in outcomes:
+            expected.update(own)
+        store = TodoStore(db_path)
+        actual = {item["id"]: item["status"] for item in store.items()}
+        store.close()
+        live = {item_id: status for item_id, status in expected.items() if status is not None}
+
+        print(f"{processes} processes x {calls} concurrent tool calls")
+        for i, (_, elapsed) in enumerate(outcomes):
+            print(f"  process {i}: {calls / elapsed:.0f} calls/s")
+        print(f"  overall: {processes * calls / wall:.0f} calls/s, including process start-up")
+        print(f"  items created {len(expected)}, live {len(live)}, found on reload {len(actual)}")
+        if actual != live:
+            missing = live.keys() - actual.keys()
+            extra = actual.keys() - live.keys()
+            wrong = [i for i in live.keys() & actual.keys() if live[i] != actual[i]]
+            raise SystemExit(f"FAILED: {len(missing)} missing, {len(extra)} unexpected, {len(wrong)} with the wrong status")
+        print("OK: no lost or misapplied writes")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [4000, 4][len(args):]))